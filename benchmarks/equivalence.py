@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from multiprocessing import Pool
+from random import getrandbits
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks.scenarios import SCENARIOS, Outcome, Scenario, outcomes
+from benchmarks.suite import revision
+from montecarlo.distributions import Distributions
+from montecarlo.equivalence import (TestResult, chi_square_homogeneity, holm, paired_test, running_stats,
+                                    welch_test)
+from montecarlo.stats import RunningStats
+
+# Fresh samples are drawn from seeds at or above this, well clear of the 0.. range the reference used.
+CHECK_SEED_OFFSET = 1 << 32
+CHUNK_SIZE = 250
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reference_outcomes.json")
+
+
+def sample(pool: Pool, name: str, seeds: Sequence[int]) -> List[Outcome]:
+    chunks = [seeds[start:start + CHUNK_SIZE] for start in range(0, len(seeds), CHUNK_SIZE)]
+    return [outcome for chunk in pool.starmap(outcomes, ((name, chunk) for chunk in chunks)) for outcome in chunk]
+
+
+def summarise(scenario: Scenario, results: Sequence[Outcome]) -> Distributions:
+    distributions = Distributions(scenario.fields, exact_limit=1024)
+    for result in results:
+        distributions.push(result)
+    return distributions
+
+
+def selected(filter_text: Optional[str]) -> List[Scenario]:
+    return [scenario for name, scenario in SCENARIOS.items() if not filter_text or filter_text in name]
+
+
+def record(filter_text: Optional[str] = None, scale: float = 1.0, seeded: int = 500) -> Dict[str, Any]:
+    # Seeds 0..trials give the reference sample; the first `seeded` outcomes are also kept as they are, so a
+    # later check can replay those seeds and compare trial by trial.
+    scenarios = {}
+    with Pool(os.cpu_count() or 1) as pool:
+        for scenario in selected(filter_text):
+            trials = max(seeded, int(scenario.trials * scale))
+            results = sample(pool, scenario.name, range(trials))
+            distributions = summarise(scenario, results)
+            scenarios[scenario.name] = {
+                "trials": trials,
+                "fields": {
+                    name: {
+                        "count": distribution.count,
+                        "mean": distribution.mean,
+                        "variance": distribution.variance,
+                        "exact": distribution.exact,
+                        "counts": distribution.items(),
+                    }
+                    for name, distribution in zip(scenario.fields, distributions)
+                },
+                "seeded": results[:seeded],
+            }
+            print(f"{scenario.name}: {trials} trials", file=sys.stderr)
+    return {"revision": revision(), "python": platform.python_version(), "scenarios": scenarios}
+
+
+def paired_results(name: str, fields: Sequence[str], old: Sequence[Outcome], new: Sequence[Outcome]
+                   ) -> List[TestResult]:
+    differences = [RunningStats() for _ in fields]
+    for old_outcome, new_outcome in zip(old, new):
+        for stats, old_value, new_value in zip(differences, old_outcome, new_outcome):
+            stats.push(new_value - old_value)
+    return [paired_test(f"{name} {field}", stats) for field, stats in zip(fields, differences)]
+
+
+def matching(old: Sequence[Outcome], new: Sequence[Outcome]) -> int:
+    return sum(tuple(a) == tuple(b) for a, b in zip(old, new))
+
+
+def check(reference: Dict[str, Any], filter_text: Optional[str] = None, alpha: float = 0.01,
+          seed: Optional[int] = None, scale: float = 1.0) -> List[TestResult]:
+    # Each scenario is run again on fresh seeds and every field compared with the reference twice: its whole
+    # distribution by chi-square and its mean by Welch's test. The stored seeded outcomes are replayed too,
+    # for a paired test per field. Holm's correction over all of them keeps the chance that an unchanged
+    # tree fails at most alpha.
+    base = CHECK_SEED_OFFSET + (seed if seed is not None else getrandbits(32)) * (1 << 24)
+    results: List[TestResult] = []
+    with Pool(os.cpu_count() or 1) as pool:
+        for scenario in selected(filter_text):
+            stored = reference["scenarios"].get(scenario.name)
+            if stored is None:
+                print(f"{scenario.name}: not in the reference, skipped", file=sys.stderr)
+                continue
+            trials = max(1, int(stored["trials"] * scale))
+            distributions = summarise(scenario, sample(pool, scenario.name, range(base, base + trials)))
+            for field, distribution in zip(scenario.fields, distributions):
+                old = stored["fields"][field]
+                label = f"{scenario.name} {field}"
+                results.append(chi_square_homogeneity(label, old["counts"], distribution.items()))
+                results.append(welch_test(label, running_stats(old["count"], old["mean"], old["variance"]),
+                                          distribution.stats))
+
+            old_seeded = stored["seeded"]
+            new_seeded = sample(pool, scenario.name, range(len(old_seeded)))
+            results.extend(paired_results(scenario.name, scenario.fields, old_seeded, new_seeded))
+            print(f"{scenario.name}: {trials} fresh trials, {matching(old_seeded, new_seeded)} of "
+                  f"{len(old_seeded)} seeded outcomes unchanged", file=sys.stderr)
+    return holm(results, alpha)
+
+
+def replay(tree: str, name: str, seeds: range, processes: int) -> List[Outcome]:
+    # Runs this checkout's scenarios.py against the game code in another checkout, a slice of seeds per process.
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios.py")
+    environment = {**os.environ, "PYTHONPATH": os.path.abspath(tree)}
+    step = -(-len(seeds) // processes)
+    runs = [subprocess.Popen([sys.executable, script, name, str(start), str(min(step, seeds.stop - start))],
+                             cwd=tree, env=environment, stdout=subprocess.PIPE, text=True)
+            for start in range(seeds.start, seeds.stop, step)]
+    replayed = []
+    for run in runs:
+        output, _ = run.communicate()
+        if run.returncode:
+            raise RuntimeError(f"Replaying {name} in {tree} failed with exit code {run.returncode}")
+        replayed.extend(json.loads(output))
+    return replayed
+
+
+def compare_trees(tree: str, filter_text: Optional[str] = None, alpha: float = 0.01, scale: float = 1.0
+                  ) -> List[TestResult]:
+    # Old (another checkout) against new (this one) on the same seeds: a paired test and a chi-square test per
+    # field. The samples share seeds, so they are positively correlated and the chi-square test only errs on
+    # the side of passing; the paired test is the sharp one.
+    results: List[TestResult] = []
+    processes = os.cpu_count() or 1
+    with Pool(processes) as pool:
+        for scenario in selected(filter_text):
+            seeds = range(max(1, int(scenario.trials * scale)))
+            old = replay(tree, scenario.name, seeds, processes)
+            new = sample(pool, scenario.name, seeds)
+            results.extend(paired_results(scenario.name, scenario.fields, old, new))
+            for field, old_distribution, new_distribution in zip(scenario.fields, summarise(scenario, old),
+                                                                 summarise(scenario, new)):
+                results.append(chi_square_homogeneity(f"{scenario.name} {field}", old_distribution.items(),
+                                                      new_distribution.items()))
+            print(f"{scenario.name}: {matching(old, new)} of {len(seeds)} outcomes identical", file=sys.stderr)
+    return holm(results, alpha)
+
+
+def report(results: Sequence[TestResult], alpha: float) -> bool:
+    for result in results:
+        if result.rejected or result.p_value < alpha:
+            status = "DIFFERENT" if result.rejected else "low p"
+            print(f"{status:>9} p={result.p_value:.3g} {result.test:>10} {result.name}")
+    rejected = [result for result in results if result.rejected]
+    print(f"{len(results)} tests, {len(rejected)} rejected at family-wise alpha {alpha}")
+    return not rejected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that game outcome distributions have not drifted")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_command = commands.add_parser("record", help="record reference distributions as JSON")
+    record_command.add_argument("--output", "-o", default="-")
+    record_command.add_argument("--seeded", type=int, default=500, help="outcomes kept for seed-by-seed replay")
+    check_command = commands.add_parser("check", help="compare this tree against recorded references")
+    check_command.add_argument("reference", nargs="?", default=REFERENCE)
+    check_command.add_argument("--seed", type=int, default=None, help="fix the fresh sample's seeds")
+    paired_command = commands.add_parser("paired", help="compare this tree against another checkout, seed by seed")
+    paired_command.add_argument("tree", help="path to the other checkout, e.g. from git worktree add")
+    for command in (record_command, check_command, paired_command):
+        command.add_argument("--filter", "-k", default=None, help="only scenarios whose name contains this")
+        command.add_argument("--scale", type=float, default=1.0, help="multiply every scenario's trial count")
+    for command in (check_command, paired_command):
+        command.add_argument("--alpha", type=float, default=0.01, help="family-wise false alarm rate")
+    options = parser.parse_args()
+
+    if options.command == "record":
+        references = record(options.filter, options.scale, options.seeded)
+        if options.output == "-":
+            json.dump(references, sys.stdout)
+        else:
+            with open(options.output, "w") as f:
+                json.dump(references, f)
+    elif options.command == "check":
+        with open(options.reference) as f:
+            references = json.load(f)
+        sys.exit(0 if report(check(references, options.filter, options.alpha, options.seed, options.scale),
+                             options.alpha) else 1)
+    else:
+        sys.exit(0 if report(compare_trees(options.tree, options.filter, options.alpha, options.scale),
+                             options.alpha) else 1)
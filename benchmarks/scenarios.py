@@ -0,0 +1,98 @@
+import argparse
+import json
+import random
+import sys
+from copy import deepcopy
+from random import Random
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Only the game code is imported here, not montecarlo, so that this file can be run against an older checkout
+# (python benchmarks/scenarios.py with PYTHONPATH pointing at it) to replay that checkout's outcomes.
+from blackjack.game import CautiousPlayer, Player, RandomPlayer, StrategicPlayer, play_blackjack
+from tonk.duel import duel
+from tonk.misc import Arc
+from tonk.tanks import m4_sherman, panzer_iv, vc_firefly
+
+Outcome = Tuple[int | float, ...]
+
+
+class Scenario:
+    # A canonical game situation whose outcome distribution should only change on purpose. trial(seed) plays
+    # it once with every source of randomness seeded from seed, so two implementations given the same seed
+    # agree trial by trial for as long as they draw the same random numbers.
+    name: str
+    fields: Tuple[str, ...]
+    trial: Callable[[int], Outcome]
+    trials: int
+
+    def __init__(self, name: str, fields: Sequence[str], trial: Callable[[int], Outcome], trials: int):
+        self.name = name
+        self.fields = tuple(fields)
+        self.trial = trial
+        self.trials = trials
+
+
+DUEL_FIELDS = ("turns", "panzer_victory", "sherman_victory", "panzer_destroy", "sherman_destroy", "panzer_bail",
+               "sherman_bail", "panzer_explode", "sherman_explode")
+SHERMAN_LINEUP = [m4_sherman, m4_sherman, vc_firefly, vc_firefly, m4_sherman]
+PANZER_LINEUP = [panzer_iv, panzer_iv, panzer_iv, panzer_iv]
+
+
+def duel_trial(seed: int) -> Outcome:
+    random.seed(seed)
+    _, shermans, panzers, turns = duel(SHERMAN_LINEUP, "Shermans", PANZER_LINEUP, "Panzers")
+    return (
+        turns,
+        int(all(not t.alive for t in shermans)),
+        int(all(not t.alive for t in panzers)),
+        sum(not t.alive for t in shermans),
+        sum(not t.alive for t in panzers),
+        sum(bool(t.bailed) for t in shermans),
+        sum(bool(t.bailed) for t in panzers),
+        sum(bool(t.exploded) for t in shermans),
+        sum(bool(t.exploded) for t in panzers),
+    )
+
+
+FIRE_FIELDS = ("hit", "crit", "damage", "panicked", "exploded", "alive")
+
+
+def fire_trial(arc: Arc) -> Callable[[int], Outcome]:
+    def trial(seed: int) -> Outcome:
+        random.seed(seed)
+        host = deepcopy(m4_sherman)
+        target = deepcopy(panzer_iv)
+        result = host.weapons[0].weapon.fire(host, target, 12.0, arc)
+        return (int(result.hit), int(result.crit), result.damage, int(result.panicked), int(bool(target.exploded)),
+                int(bool(target.alive)))
+    return trial
+
+
+def blackjack_trial(player_class: type) -> Callable[[int], Outcome]:
+    def trial(seed: int) -> Outcome:
+        rng = Random(seed)
+        return play_blackjack(rng, player_class(rng), 10),
+    return trial
+
+
+SCENARIOS: Dict[str, Scenario] = {scenario.name: scenario for scenario in [
+    Scenario("duel[5 Shermans v 4 Panzers]", DUEL_FIELDS, duel_trial, 2_000),
+    Scenario("fire[75mm v Panzer IV front]", FIRE_FIELDS, fire_trial(Arc.front), 20_000),
+    Scenario("fire[75mm v Panzer IV side]", FIRE_FIELDS, fire_trial(Arc.side), 20_000),
+    *(Scenario(f"blackjack[{player.__name__}, 10 rounds]", ("winnings",), blackjack_trial(player), 20_000)
+      for player in (Player, RandomPlayer, CautiousPlayer, StrategicPlayer)),
+]}
+
+
+def outcomes(name: str, seeds: Sequence[int]) -> List[Outcome]:
+    trial = SCENARIOS[name].trial
+    return [trial(seed) for seed in seeds]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print one scenario's outcomes for a range of seeds as JSON")
+    parser.add_argument("scenario")
+    parser.add_argument("start", type=int)
+    parser.add_argument("count", type=int)
+    options = parser.parse_args()
+    json.dump(outcomes(options.scenario, range(options.start, options.start + options.count)), sys.stdout)
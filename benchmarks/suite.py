@@ -0,0 +1,242 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+from multiprocessing import Pool
+from random import Random
+from statistics import quantiles
+from typing import Any, Callable, Dict, List, Optional
+
+from blackjack.game import CautiousPlayer, Deck, Player, RandomPlayer, StrategicPlayer, play_blackjack
+from montecarlo.progress import RoundEvent
+from montecarlo.sim import (die_discriminator, monte_carlo_improved, monte_carlo_self_stabalising,
+                            monte_carlo_self_stabalising_parallel, roll_die)
+from tonk.duel import duel
+from tonk.misc import Arc
+from tonk.tanks import m4_sherman, panzer_iv, vc_firefly
+
+
+class Benchmark:
+    # trials_per_call None means each call returns how many trials it ran, for calls that do not run a fixed
+    # number.
+    name: str
+    setup: Callable[[], Callable[[], Any]]
+    trials_per_call: Optional[int]
+    min_seconds: float
+    max_calls: int
+    memory_calls: int
+
+    def __init__(self, name: str, setup: Callable[[], Callable[[], Any]], trials_per_call: Optional[int] = 1,
+                 min_seconds: float = 2.0, max_calls: int = 100_000, memory_calls: int = 10):
+        self.name = name
+        self.setup = setup
+        self.trials_per_call = trials_per_call
+        self.min_seconds = min_seconds
+        self.max_calls = max_calls
+        self.memory_calls = memory_calls
+
+    def run(self) -> Dict[str, Any]:
+        random.seed(0)
+        call = self.setup()
+        call()
+
+        durations: List[float] = []
+        trials = 0
+        started = time.perf_counter()
+        while len(durations) < self.max_calls and time.perf_counter() - started < self.min_seconds:
+            before = time.perf_counter()
+            ran = call()
+            durations.append(time.perf_counter() - before)
+            trials += self.trials_per_call if self.trials_per_call is not None else ran
+        total = sum(durations)
+
+        # tracemalloc slows allocation-heavy code several fold, so peak memory gets its own short pass
+        # rather than distorting the timings above.
+        tracemalloc.start()
+        for _ in range(self.memory_calls):
+            call()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if len(durations) > 1:
+            cuts = quantiles(durations, n=100, method="inclusive")
+            p50, p90, p99 = cuts[49], cuts[89], cuts[98]
+        else:
+            p50 = p90 = p99 = durations[0]
+        return {
+            "calls": len(durations),
+            "trials_per_call": trials / len(durations),
+            "trials_per_second": trials / total if total else math.inf,
+            "latency_seconds": {"mean": total / len(durations), "p50": p50, "p90": p90, "p99": p99},
+            "peak_memory_bytes": peak,
+        }
+
+
+SHERMAN_LINEUP = [m4_sherman, m4_sherman, vc_firefly, vc_firefly, m4_sherman]
+PANZER_LINEUP = [panzer_iv, panzer_iv, panzer_iv, panzer_iv]
+
+
+def duel_lineup() -> Callable[[], Any]:
+    return lambda: duel(SHERMAN_LINEUP, "Shermans", PANZER_LINEUP, "Panzers")
+
+
+def weapon_fire() -> Callable[[], Any]:
+    host = deepcopy(m4_sherman)
+    target = deepcopy(panzer_iv)
+    pristine = dict(vars(target))
+    weapon = host.weapons[0].weapon
+
+    def fire():
+        # Critical hits leave damage and status flags behind, so every shot is at an undamaged tank.
+        vars(target).clear()
+        vars(target).update(pristine)
+        return weapon.fire(host, target, 12.0, Arc.front)
+    return fire
+
+
+def blackjack_session(player_class: type) -> Callable[[], Callable[[], Any]]:
+    def setup():
+        rng = Random(0)
+        player = player_class(rng)
+        return lambda: play_blackjack(rng, player, 10)
+    return setup
+
+
+def deck_construction() -> Callable[[], Any]:
+    rng = Random(0)
+    return lambda: Deck(rng)
+
+
+def deck_dealing() -> Callable[[], Any]:
+    rng = Random(0)
+
+    def deal():
+        shoe = Deck(rng)
+        for _ in range(52):
+            shoe.deal()
+    return deal
+
+
+def engine_improved() -> Callable[[], Any]:
+    return lambda: monte_carlo_improved(roll_die, die_discriminator, 100_000, streaming=True)
+
+
+def trials_run(engine: Callable[..., Any], *args: Any, **kwargs: Any) -> int:
+    # Runs a self-stabilising engine and returns how many trials it took, from its final progress event.
+    events: List[RoundEvent] = []
+    engine(*args, progress=events.append, **kwargs)
+    return events[-1].trials
+
+
+def engine_self_stabalising() -> Callable[[], Any]:
+    return lambda: trials_run(monte_carlo_self_stabalising, roll_die, die_discriminator, 2, 5, 20_000,
+                              streaming=True, seed=0)
+
+
+def engine_parallel(pool: Pool, chunk_size: Optional[int]) -> Callable[[], Callable[[], Any]]:
+    def setup():
+        return lambda: trials_run(monte_carlo_self_stabalising_parallel, roll_die, die_discriminator, 2, 5, 20_000,
+                                  chunk_size=chunk_size, seed=0, pool=pool)
+    return setup
+
+
+def suite(pool: Pool) -> List[Benchmark]:
+    # The self-stabilising engines run until the mean settles, so their calls count their own trials: at least
+    # six rounds of 20k die rolls, as the first round cannot count towards stability.
+    return [
+        Benchmark("tonk.duel.duel[5 Shermans v 4 Panzers]", duel_lineup),
+        Benchmark("tonk.weapon.Weapon.fire[75mm v Panzer IV front]", weapon_fire),
+        *(Benchmark(f"blackjack.play_blackjack[{player.__name__}, 10 rounds]", blackjack_session(player))
+          for player in (Player, RandomPlayer, CautiousPlayer, StrategicPlayer)),
+        Benchmark("blackjack.Deck[construct]", deck_construction),
+        Benchmark("blackjack.Deck[construct and deal 52]", deck_dealing),
+        Benchmark("montecarlo.monte_carlo_improved[roll_die, streaming]", engine_improved, 100_000,
+                  max_calls=20, memory_calls=1),
+        Benchmark("montecarlo.monte_carlo_self_stabalising[roll_die, streaming]", engine_self_stabalising, None,
+                  max_calls=20, memory_calls=1),
+        Benchmark("montecarlo.monte_carlo_self_stabalising_parallel[roll_die, per trial]", engine_parallel(pool, None),
+                  None, max_calls=5, memory_calls=1),
+        Benchmark("montecarlo.monte_carlo_self_stabalising_parallel[roll_die, chunks of 2500]",
+                  engine_parallel(pool, 2_500), None, max_calls=20, memory_calls=1),
+    ]
+
+
+def revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(selected: Optional[str] = None, min_seconds: Optional[float] = None) -> Dict[str, Any]:
+    results = {}
+    with Pool(os.cpu_count() or 1) as pool:
+        for benchmark in suite(pool):
+            if selected and selected not in benchmark.name:
+                continue
+            if min_seconds is not None:
+                benchmark.min_seconds = min_seconds
+            results[benchmark.name] = benchmark.run()
+            print(f"{benchmark.name}: {results[benchmark.name]['trials_per_second']:.1f} trials/s, "
+                  f"p50 {results[benchmark.name]['latency_seconds']['p50'] * 1e3:.3f}ms", file=sys.stderr)
+    return {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], tolerance: float = 0.05) -> List[str]:
+    regressions = []
+    for name, old in baseline["results"].items():
+        new = candidate["results"].get(name)
+        if new is None:
+            continue
+        ratio = new["trials_per_second"] / old["trials_per_second"]
+        memory = new["peak_memory_bytes"] / old["peak_memory_bytes"] if old["peak_memory_bytes"] else 1.0
+        status = "ok"
+        if ratio < 1 - tolerance:
+            status = "SLOWER"
+            regressions.append(name)
+        elif ratio > 1 + tolerance:
+            status = "faster"
+        print(f"{status:>6} {ratio:6.2f}x throughput {memory:6.2f}x peak memory  {name}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_command = commands.add_parser("run", help="run the suite and write JSON results")
+    run_command.add_argument("--output", "-o", default="-")
+    run_command.add_argument("--filter", "-k", default=None, help="only run benchmarks whose name contains this")
+    run_command.add_argument("--min-seconds", type=float, default=None)
+    compare_command = commands.add_parser("compare", help="compare two JSON results files")
+    compare_command.add_argument("baseline")
+    compare_command.add_argument("candidate")
+    compare_command.add_argument("--tolerance", type=float, default=0.05)
+    options = parser.parse_args()
+
+    if options.command == "run":
+        report = run(options.filter, options.min_seconds)
+        if options.output == "-":
+            json.dump(report, sys.stdout, indent=2)
+        else:
+            with open(options.output, "w") as f:
+                json.dump(report, f, indent=2)
+    else:
+        with open(options.baseline) as f:
+            baseline_report = json.load(f)
+        with open(options.candidate) as f:
+            candidate_report = json.load(f)
+        sys.exit(1 if compare(baseline_report, candidate_report, options.tolerance) else 0)
@@ -0,0 +1,218 @@
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+
+from blackjack.game import Action, CautiousPlayer, Player, StrategicPlayer, deck, hand_value
+
+# A shoe is the count of each card left in it, by value from 2 to 11.
+Shoe = Tuple[int, ...]
+Choice = Action | Mapping[Action, float]
+CARDS = tuple(range(2, 12))
+FULL_SHOE: Shoe = tuple(deck.count(card) for card in CARDS)
+
+
+def shoe_of(cards: Iterable[int]) -> Shoe:
+    cards = list(cards)
+    return tuple(cards.count(card) for card in CARDS)
+
+
+def draws(shoe: Shoe) -> Iterator[Tuple[int, float, Shoe]]:
+    # Every card that can come next, with its probability and the shoe it leaves. An empty shoe is refilled
+    # with a whole deck, as Deck.deal does.
+    total = sum(shoe)
+    if not total:
+        shoe, total = FULL_SHOE, sum(FULL_SHOE)
+    for index, count in enumerate(shoe):
+        if count:
+            yield CARDS[index], count / total, shoe[:index] + (count - 1,) + shoe[index + 1:]
+
+
+def _value(total: int, aces: int) -> int:
+    # hand_value for a hand summing to total with aces counted as 11: past 21 every ace counts as one.
+    return total if total <= 21 else total - 10 * aces
+
+
+# The dealer stands on 17 to 21 or busts; every bust loses to every hand still in play, so they are one outcome.
+STANDS = tuple(range(17, 22))
+BUST = len(STANDS)
+_FINAL = {value: tuple(float(index == outcome) for index in range(BUST + 1))
+          for outcome, value in enumerate(STANDS)}
+_BUSTED = tuple(float(index == BUST) for index in range(BUST + 1))
+
+
+@lru_cache(maxsize=None)
+def dealer_outcomes(shoe: Shoe, total: int, aces: int) -> Tuple[float, ...]:
+    # The chance of each dealer outcome (standing on each of STANDS, then busting) from a hand summing to
+    # total, drawing from shoe below 17.
+    value = _value(total, aces)
+    if value >= 17:
+        return _FINAL.get(value, _BUSTED)
+    outcomes = [0.0] * (BUST + 1)
+    for card, probability, rest in draws(shoe):
+        for index, chance in enumerate(dealer_outcomes(rest, total + card, aces + (card == 11))):
+            outcomes[index] += probability * chance
+    return tuple(outcomes)
+
+
+@lru_cache(maxsize=None)
+def dealer_hands(shoe: Shoe, dealer_card: int) -> Tuple[Tuple[float, ...], float]:
+    # What a hand standing on each of STANDS wins once the dealer has drawn from shoe (two for a win, one for
+    # a push), and the chance that the dealer's first two cards make 21, which is what insurance pays on.
+    outcomes = [0.0] * (BUST + 1)
+    dealer_21 = 0.0
+    for hole, probability, rest in draws(shoe):
+        total, aces = dealer_card + hole, (dealer_card == 11) + (hole == 11)
+        if _value(total, aces) == 21:
+            dealer_21 += probability
+        for index, chance in enumerate(dealer_outcomes(rest, total, aces)):
+            outcomes[index] += probability * chance
+    winnings = tuple(2 * sum(outcomes[:position]) + outcomes[position] for position in range(len(STANDS)))
+    return winnings, dealer_21
+
+
+@lru_cache(maxsize=None)
+def dealer_21(shoe: Shoe, dealer_card: int) -> float:
+    return sum(probability for hole, probability, _ in draws(shoe)
+               if _value(dealer_card + hole, (dealer_card == 11) + (hole == 11)) == 21)
+
+
+def showdown(shoe: Shoe, dealer_card: int, value: Optional[int]) -> Tuple[float, float]:
+    # What one hand of value (None for a hand out of play) wins against the dealer, who draws from shoe, and
+    # the chance that the dealer's first two cards make 21. The dealer always ends on 17 or more, so a hand
+    # below 17 can neither win nor push and the dealer's draws need not be followed.
+    if value is None or value < STANDS[0]:
+        return 0.0, dealer_21(shoe, dealer_card)
+    winnings, made_21 = dealer_hands(shoe, dealer_card)
+    return winnings[value - STANDS[0]], made_21
+
+
+class _NoRandom:
+    # Stands in for a Player's rng, so that a strategy that rolls dice fails rather than being averaged over
+    # one arbitrary roll.
+    def __getattr__(self, name: str) -> Any:
+        raise ValueError("This strategy draws random numbers; give its odds as a DecisionTable, like RANDOM_PLAYER")
+
+
+class DecisionTable:
+    # A strategy as lookups rather than code. hard and soft map (hand_value, dealer card) to a choice, pairs
+    # maps (paired card, dealer card), and anything missing gets default. A choice is an Action or the odds
+    # of several. Insurance is taken against the dealer cards in insurance, with the given probability when
+    # it is a mapping. Soft hands hold an ace still counted as 11.
+    hard: Dict[Tuple[int, int], Choice]
+    soft: Dict[Tuple[int, int], Choice]
+    pairs: Dict[Tuple[int, int], Choice]
+    insurance_odds: Dict[int, float]
+    default: Choice
+
+    def __init__(self, hard: Optional[Mapping[Tuple[int, int], Choice]] = None,
+                 soft: Optional[Mapping[Tuple[int, int], Choice]] = None,
+                 pairs: Optional[Mapping[Tuple[int, int], Choice]] = None,
+                 insurance: Mapping[int, float] | Iterable[int] = (), default: Choice = Action.stand):
+        self.hard = dict(hard or {})
+        self.soft = dict(soft or {})
+        self.pairs = dict(pairs or {})
+        self.insurance_odds = dict(insurance) if isinstance(insurance, Mapping) else dict.fromkeys(insurance, 1.0)
+        self.default = default
+
+    def insurance(self, dealer_card: int) -> float:
+        return self.insurance_odds.get(dealer_card, 0.0)
+
+    def play(self, dealer_card: int, cards: Sequence[int]) -> Choice:
+        if len(cards) == 2 and cards[0] == cards[1] and (cards[0], dealer_card) in self.pairs:
+            return self.pairs[cards[0], dealer_card]
+        value = hand_value(cards)
+        table = self.soft if 11 in cards and sum(cards) <= 21 else self.hard
+        return table.get((value, dealer_card), self.default)
+
+
+# The odds RandomPlayer plays by.
+RANDOM_PLAYER = DecisionTable(insurance={10: 0.5, 11: 0.5}, default={Action.hit: 0.5, Action.stand: 0.5})
+
+
+class ExactValue:
+    # The expected winnings of one round of play_blackjack, worked out over every order the shoe can deal in
+    # rather than sampled. strategy is a Player, a Player subclass or a DecisionTable; any of them may answer
+    # with odds in place of a decision. The rules are play_blackjack's as written, quirks included: a
+    # natural pays 2.5 whatever the dealer holds, a split is played as a stand (the game only splits when two
+    # hands are already waiting), a double counts the hand twice, and a dealer who busts still beats every
+    # hand below their total. Player decisions are memoised by dealer card and cards, and dealer outcomes by
+    # shoe for every strategy. Unless ordered, the strategy is taken to decide on which cards it holds and not
+    # the order they came in (true of every Player here), and is shown them in ascending order, which lets
+    # hands drawn in any order share one entry; pass ordered=True for a strategy that looks at the order.
+    strategy: Any
+    ordered: bool
+
+    def __init__(self, strategy: Any, ordered: bool = False):
+        self.strategy = strategy(_NoRandom()) if isinstance(strategy, type) else strategy
+        self.ordered = ordered
+        self._hands: Dict[Tuple[Shoe, int, Tuple[int, ...]], Tuple[float, float]] = {}
+
+    def _choices(self, dealer_card: int, cards: Tuple[int, ...]) -> Iterable[Tuple[Action, float]]:
+        choice = self.strategy.play(dealer_card, list(cards))
+        return choice.items() if isinstance(choice, Mapping) else ((choice, 1.0),)
+
+    def _act(self, shoe: Shoe, dealer_card: int, cards: Tuple[int, ...], action: Action) -> Tuple[float, float]:
+        # Winnings from here on and the chance the dealer makes 21 from two cards, taking action with cards.
+        if action is Action.split or (action is Action.surrender and len(cards) != 2):
+            action = Action.stand
+        if action is Action.stand:
+            return showdown(shoe, dealer_card, hand_value(cards))
+        if action is Action.surrender:
+            _, dealer_21 = showdown(shoe, dealer_card, None)
+            return 0.5, dealer_21
+        winnings = dealer_21 = 0.0
+        total, aces = sum(cards), cards.count(11)
+        for card, probability, rest in draws(shoe):
+            value = _value(total + card, aces + (card == 11))
+            if action is Action.double:
+                won, made_21 = showdown(rest, dealer_card, value if value <= 21 else None)
+                won *= 2
+            elif value >= 21:
+                won, made_21 = showdown(rest, dealer_card, value if value == 21 else None)
+            else:
+                hand = cards + (card,) if self.ordered else tuple(sorted(cards + (card,)))
+                won, made_21 = self._hand(rest, dealer_card, hand)
+            winnings += probability * won
+            dealer_21 += probability * made_21
+        return winnings - (action is Action.double), dealer_21
+
+    def _hand(self, shoe: Shoe, dealer_card: int, cards: Tuple[int, ...]) -> Tuple[float, float]:
+        key = shoe, dealer_card, cards
+        if key not in self._hands:
+            winnings = dealer_21 = 0.0
+            for action, odds in self._choices(dealer_card, cards):
+                won, made_21 = self._act(shoe, dealer_card, cards, action)
+                winnings += odds * won
+                dealer_21 += odds * made_21
+            self._hands[key] = winnings, dealer_21
+        return self._hands[key]
+
+    def round(self, shoe: Shoe = FULL_SHOE) -> float:
+        # Expected winnings of a round dealt from shoe, counting the stake as already paid.
+        value = 0.0
+        for dealer_card, p_dealer, after_dealer in draws(shoe):
+            insurance = float(self.strategy.insurance(dealer_card))
+            dealt = -1 - 0.5 * insurance
+            for first, p_first, after_first in draws(after_dealer):
+                for second, p_second, rest in draws(after_first):
+                    cards = (first, second) if self.ordered or first <= second else (second, first)
+                    if hand_value(cards) == 21:
+                        _, dealer_21 = showdown(rest, dealer_card, None)
+                        winnings = 2.5
+                    else:
+                        winnings, dealer_21 = self._hand(rest, dealer_card, cards)
+                    dealt += p_first * p_second * (winnings + insurance * dealer_21)
+            value += p_dealer * dealt
+        return value
+
+
+def round_value(strategy: Any, shoe: Shoe = FULL_SHOE, ordered: bool = False) -> float:
+    return ExactValue(strategy, ordered).round(shoe)
+
+
+if __name__ == "__main__":
+    import time
+
+    for strategy in (Player, CautiousPlayer, StrategicPlayer, RANDOM_PLAYER):
+        started = time.perf_counter()
+        name = strategy.__name__ if isinstance(strategy, type) else "RANDOM_PLAYER"
+        print(f"{name}: {round_value(strategy):+.6f} per round ({time.perf_counter() - started:.2f}s)")
@@ -1,19 +1,22 @@
-v = [
-(0,23.2568039361),
-(1,37.2108862978),
-(2,26.0476204085),
-(3,10.4190481634),
-(4,0.337577160494),
-(5,0.990226337449),
-(6,1.09525034294),
-(7,0.541552354824),
-(8,0.101034998476),]
+from montecarlo.distributions import Distributions
+from montecarlo.progress import print_progress
+from montecarlo.sim import monte_carlo_self_stabalising_parallel
+from montecarlo.stopping import Precision
+from tonk.sim import DUEL_FIELDS, discriminator, duel_instrumented
 
-# 1.58873456790137 vs 1.3803536046343696
 
-s = 0
+def print_distribution(name, distribution):
+    print(f"{name}:")
+    for value, percentage in distribution.table():
+        print(f"  {value:>4} {percentage:8.3f}%")
+    print(f"  expected value {distribution.mean:.4f}, median {distribution.median}, "
+          f"90th percentile {distribution.quantile(0.9)}")
 
-for a, b in v:
-    s += a * (b/100)
 
-print(s)
+if __name__ == "__main__":
+    distributions = Distributions(DUEL_FIELDS)
+    monte_carlo_self_stabalising_parallel(duel_instrumented, discriminator, chunk_size=50, store=distributions,
+                                          precision=Precision(0.01), progress=print_progress)
+
+    for field in ("turns", "panzer_destroy", "sherman_destroy"):
+        print_distribution(field, distributions[field])
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import importlib
+import json
+import sys
+import time
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from montecarlo.distributions import Distributions
+from montecarlo.executors import make_executor
+from montecarlo.exemplars import Exemplars, Reservoir, takes_keyword
+from montecarlo.jobs import JobRunner
+from montecarlo.metrics import MetricPrecision, Metrics
+from montecarlo.progress import RoundEvent, print_progress
+from montecarlo.sim import pool_size
+from montecarlo.stopping import Precision
+from montecarlo.tuning import AutoTune
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Executors that run trials in this interpreter, on the job's runner thread or beside it.
+IN_PROCESS = ("serial", "thread")
+
+
+class PrecisionSpec(BaseModel):
+    half_width: float
+    relative: bool = False
+    confidence_level: float = 0.95
+    min_trials: int = 100
+
+    def build(self) -> Precision:
+        return Precision(self.half_width, self.relative, self.confidence_level, self.min_trials)
+
+
+class JobSpec(BaseModel):
+    # One simulation in a job file. func and discriminator are "module:attribute" paths; with fields naming
+    # the parts of func's result, the discriminator can be one of those names instead, metrics can give
+    # several of them their own precision targets, and distributions collects the histogram or quantiles of
+    # every field. With round_seconds, rounds and chunks are sized to take about that long from measured
+    # trial costs, and iterations_per_round and chunk_size are ignored. exemplars keeps that many example
+    # trials, with their logs if func takes a logs list, from all trials and from each of exemplar_categories
+    # (names against "module:attribute" predicates on func's result).
+    name: str
+    func: str
+    discriminator: Optional[str] = None
+    args: List[Any] = []
+    fields: Optional[List[str]] = None
+    required_confidence: int = 3
+    required_stability: int = 10
+    iterations_per_round: int = 1000
+    chunk_size: Optional[int] = 100
+    seed: Optional[int] = None
+    precision: Optional[PrecisionSpec] = None
+    metrics: Optional[Dict[str, PrecisionSpec]] = None
+    distributions: bool = False
+    trial_timeout: Optional[float] = None
+    round_seconds: Optional[float] = None
+    exemplars: int = 0
+    exemplar_categories: Dict[str, str] = {}
+
+
+def load_object(path: str) -> Any:
+    module, _, attribute = path.partition(":")
+    if not attribute:
+        raise ValueError(f"Expected module:attribute, got {path!r}")
+    value = importlib.import_module(module)
+    for part in attribute.split("."):
+        value = getattr(value, part)
+    return value
+
+
+def load_jobs(path: str) -> List[JobSpec]:
+    # A job file is either a list of jobs or {"defaults": {...}, "jobs": [...]}, where every job starts from
+    # the defaults and overrides what it needs to.
+    with open(path) as f:
+        document = json.load(f)
+    if isinstance(document, list):
+        document = {"jobs": document}
+    defaults = document.get("defaults", {})
+    jobs = [JobSpec(**{**defaults, **job}) for job in document["jobs"]]
+    names = [job.name for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Job names must be unique, found {', '.join(duplicates)} more than once")
+    return jobs
+
+
+def field_getter(spec: JobSpec, name: str) -> Callable[[tuple], Any]:
+    if spec.fields is None or name not in spec.fields:
+        raise ValueError(f"Job {spec.name}: {name!r} is not one of its fields")
+    return itemgetter(spec.fields.index(name))
+
+
+def engine_arguments(spec: JobSpec) -> Dict[str, Any]:
+    if spec.metrics:
+        if spec.fields is None:
+            raise ValueError(f"Job {spec.name}: metrics need fields")
+        discriminator = Metrics.from_fields(spec.fields)
+        precision = MetricPrecision({name: target.build() for name, target in spec.metrics.items()})
+        for name in spec.metrics:
+            field_getter(spec, name)
+    elif spec.discriminator is None:
+        raise ValueError(f"Job {spec.name}: needs a discriminator or metrics")
+    else:
+        discriminator = (load_object(spec.discriminator) if ":" in spec.discriminator
+                         else field_getter(spec, spec.discriminator))
+        precision = spec.precision.build() if spec.precision else None
+    categories = {name: load_object(path) for name, path in spec.exemplar_categories.items()}
+    func = load_object(spec.func)
+
+    return dict(
+        func=func,
+        discriminator=discriminator,
+        args=spec.args,
+        required_confidence=spec.required_confidence,
+        required_stability=spec.required_stability,
+        iterations_per_round=spec.iterations_per_round,
+        chunk_size=spec.chunk_size,
+        seed=spec.seed,
+        precision=precision,
+        store=Distributions(spec.fields) if spec.distributions else None,
+        trial_timeout=spec.trial_timeout,
+        tune=AutoTune(spec.round_seconds) if spec.round_seconds else None,
+        exemplars=Exemplars(spec.exemplars, categories, "logs" if takes_keyword(func, "logs") else None)
+        if spec.exemplars else None,
+    )
+
+
+def describe_distributions(distributions: Distributions) -> Dict[str, Any]:
+    described = {}
+    for index, distribution in enumerate(distributions):
+        name = distributions.names[index] if distributions.names else str(index)
+        described[name] = {
+            "mean": distribution.mean,
+            "std": distribution.std,
+            "exact": distribution.exact,
+            "quantiles": dict(zip(map(str, QUANTILES), distribution.quantiles(QUANTILES))),
+            "table": distribution.table(),
+        }
+    return described
+
+
+def describe_exemplars(exemplars: Exemplars) -> Dict[str, Any]:
+    def describe(reservoir: Reservoir) -> Dict[str, Any]:
+        return {
+            "seen": reservoir.seen,
+            "trials": [{"seed": exemplar.seed, "result": exemplar.result, "logs": exemplar.logs}
+                       for exemplar in reservoir],
+        }
+    return {"sample": describe(exemplars.sample),
+            "categories": {name: describe(reservoir) for name, reservoir in exemplars.by_category.items()}}
+
+
+def check_in_process(jobs: List[JobSpec], executor: str, interleave: int):
+    # Jobs run on runner threads, where SIGALRM cannot reach their trials, and interleaved ones share this
+    # interpreter's generator, which exemplars reseed for every trial.
+    if executor not in IN_PROCESS:
+        return
+    for spec in jobs:
+        if spec.trial_timeout:
+            raise ValueError(f"Job {spec.name}: trial_timeout needs an executor with worker processes, "
+                             f"not {executor}")
+        if spec.exemplars and interleave > 1:
+            raise ValueError(f"Job {spec.name}: exemplars under the {executor} executor need --interleave 1")
+
+
+class JobLog:
+    # Tallies a job's rounds from its progress events, for the timing half of its record.
+    def __init__(self, name: str, verbose: bool):
+        self.name = name
+        self.verbose = verbose
+        self.rounds = 0
+        self.compute_seconds = 0.0
+        self.queued = time.perf_counter()
+
+    def __call__(self, event: RoundEvent):
+        if not event.finished:
+            self.rounds += 1
+            self.compute_seconds += event.compute_seconds or 0.0
+        if self.verbose:
+            print(f"{self.name}: ", end="")
+            print_progress(event)
+
+
+async def run_jobs(jobs: List[JobSpec], output: str, pool: Any, interleave: int, verbose: bool) -> int:
+    # Jobs start in file order; with interleave above one that many share the pool at a time, so the rounds
+    # of a slow job and a quick one overlap instead of the quick one waiting. Each record is written as soon
+    # as its job ends, whatever order that is in.
+    failures = 0
+    with open(output, "w") as out:
+        async with JobRunner(pool=pool, max_jobs=interleave) as runner, asyncio.TaskGroup() as group:
+            def write(record: Dict[str, Any]):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+            async def run(spec: JobSpec):
+                nonlocal failures
+                log = JobLog(spec.name, verbose)
+                record: Dict[str, Any] = {"name": spec.name}
+                try:
+                    arguments = engine_arguments(spec)
+                    exemplars = arguments["exemplars"]
+                    job = runner.submit(arguments.pop("func"), arguments.pop("discriminator"),
+                                        *arguments.pop("args"), progress=log, **arguments)
+                    estimate, results = await job
+                except Exception as e:
+                    failures += 1
+                    record["error"] = f"{type(e).__name__}: {e}"
+                    print(f"{spec.name}: failed, {record['error']}", file=sys.stderr)
+                    write(record)
+                    return
+
+                finished = job.latest
+                record.update(
+                    estimate=estimate,
+                    interval=finished.interval,
+                    trials=finished.trials,
+                    timed_out=finished.timed_out,
+                    details=finished.details,
+                    timing={
+                        "seconds": finished.elapsed,
+                        "queued_seconds": time.perf_counter() - log.queued - finished.elapsed,
+                        "rounds": log.rounds,
+                        "compute_seconds": log.compute_seconds,
+                        "trials_per_second": finished.trials / finished.elapsed if finished.elapsed else None,
+                    },
+                )
+                if isinstance(results, Distributions):
+                    record["distributions"] = describe_distributions(results)
+                if exemplars is not None:
+                    record["exemplars"] = describe_exemplars(exemplars)
+                write(record)
+                print(f"{spec.name}: {estimate} after {finished.trials} trials in {finished.elapsed:.2f}s")
+
+            for spec in jobs:
+                group.create_task(run(spec))
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a file of simulation jobs on one long-lived worker pool.")
+    parser.add_argument("jobs", help="JSON job file")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="one JSON record per job")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-i", "--interleave", type=int, default=1, help="jobs sharing the pool at once")
+    parser.add_argument("--executor", default="process")
+    parser.add_argument("--start-method", default=None, help="fork, spawn or forkserver (process executor)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every round")
+    options = parser.parse_args(argv)
+
+    jobs = load_jobs(options.jobs)
+    # Resolving every job up front catches a bad file before anything runs, and imports the simulation code
+    # into this process so that forked workers start with it.
+    for spec in jobs:
+        engine_arguments(spec)
+    check_in_process(jobs, options.executor, max(1, options.interleave))
+    started = time.perf_counter()
+    executor_options = {"start_method": options.start_method} if options.start_method else {}
+    pool = make_executor(options.executor, options.workers, **executor_options)
+    # Make every worker start now, so the first job is not charged for it.
+    workers = pool_size(pool)
+    pool.map(abs, range(workers * 4))
+    print(f"Started {workers} {options.executor} workers in {time.perf_counter() - started:.2f}s")
+
+    try:
+        failures = asyncio.run(run_jobs(jobs, options.output, pool, max(1, options.interleave), options.verbose))
+    finally:
+        pool.close()
+        pool.join()
+
+    print(f"Ran {len(jobs)} jobs in {time.perf_counter() - started:.2f}s, {failures} failed; "
+          f"results in {options.output}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import signal
+import threading
+import time
+from typing import Any, Callable
+
+_local = threading.local()
+
+
+class TrialTimeout(Exception):
+    # Raised inside a trial that has used up its budget. A trial with a budget of its own (a turn limit, say)
+    # raises it itself; either way the engine drops the trial and counts it as timed out.
+    pass
+
+
+def check_deadline():
+    # For trials running where the alarm cannot reach them (any thread but a process's main thread), which
+    # have to call this now and then to honour a TrialBudget.
+    deadline = getattr(_local, "deadline", None)
+    if deadline is not None and time.perf_counter() > deadline:
+        raise TrialTimeout()
+
+
+def _alarm(signum: int, frame: Any):
+    raise TrialTimeout()
+
+
+def _can_alarm() -> bool:
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+class TrialBudget:
+    # A wall-clock limit on every trial. In a process's main thread (the workers of a process pool, or a serial
+    # run) it is enforced with a SIGALRM interval timer, so trials need no changes; elsewhere it is only
+    # enforced at the trial's own check_deadline() calls.
+    seconds: float
+
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("seconds must be positive")
+        self.seconds = seconds
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        _local.deadline = time.perf_counter() + self.seconds
+        alarm = _can_alarm()
+        if alarm:
+            previous = signal.signal(signal.SIGALRM, _alarm)
+            signal.setitimer(signal.ITIMER_REAL, self.seconds)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous)
+            _local.deadline = None
+
+    def __repr__(self):
+        return f"TrialBudget({self.seconds})"
@@ -0,0 +1,153 @@
+import enum
+import hashlib
+import os
+import sys
+import sysconfig
+import types
+from functools import partial
+from typing import Any, List, Optional, Set
+
+CACHE_SUFFIX = ".ckpt"
+
+
+def _library_paths() -> List[str]:
+    paths = sysconfig.get_paths()
+    return sorted({os.path.realpath(paths[name]) for name in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+
+def fingerprint(value: Any, modules: Optional[Set[str]] = None, _active: Optional[Set[int]] = None) -> str:
+    # A repr that is stable across processes: functions and classes by qualified name, plain objects by
+    # class and attributes, dicts and sets in sorted order. Anything that only has an address-based repr
+    # is rejected rather than given a key that changes every run. Modules that define the functions,
+    # classes and instances met on the way are added to `modules`.
+    if modules is None:
+        modules = set()
+    if _active is None:
+        _active = set()
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return repr(value)
+    if isinstance(value, enum.Enum):
+        modules.add(type(value).__module__)
+        return f"{type(value).__module__}.{type(value).__qualname__}.{value.name}"
+    if isinstance(value, partial):
+        return (f"partial({fingerprint(value.func, modules, _active)}, {fingerprint(value.args, modules, _active)}, "
+                f"{fingerprint(value.keywords, modules, _active)})")
+    if isinstance(value, types.MethodType) or (isinstance(value, types.BuiltinFunctionType)
+                                               and not isinstance(value.__self__, (types.ModuleType, type(None)))):
+        return f"{fingerprint(value.__self__, modules, _active)}.{value.__name__}"
+    if isinstance(value, types.FunctionType):
+        # Lambdas and closures share a qualified name across definitions, so their location and captured
+        # values are part of the fingerprint too.
+        modules.add(value.__module__)
+        cells = tuple(cell.cell_contents for cell in value.__closure__ or ())
+        closure = f", {fingerprint(cells, modules, _active)}" if cells else ""
+        return f"{value.__module__}.{value.__qualname__}:{value.__code__.co_firstlineno}{closure}"
+    if isinstance(value, (type, types.BuiltinFunctionType)):
+        modules.add(value.__module__)
+        return f"{value.__module__}.{value.__qualname__}"
+
+    if id(value) in _active:
+        raise ValueError(f"Cannot fingerprint self-referencing {type(value).__name__}")
+    _active.add(id(value))
+    try:
+        if isinstance(value, (list, tuple)):
+            items = ", ".join(fingerprint(item, modules, _active) for item in value)
+            return f"{type(value).__name__}[{items}]"
+        if isinstance(value, (set, frozenset)):
+            return f"set[{', '.join(sorted(fingerprint(item, modules, _active) for item in value))}]"
+        if isinstance(value, dict):
+            items = sorted(f"{fingerprint(key, modules, _active)}: {fingerprint(item, modules, _active)}"
+                           for key, item in value.items())
+            return f"dict[{', '.join(items)}]"
+        if hasattr(value, "__dict__"):
+            modules.add(type(value).__module__)
+            return f"{type(value).__module__}.{type(value).__qualname__}({fingerprint(vars(value), modules, _active)})"
+    finally:
+        _active.discard(id(value))
+
+    text = repr(value)
+    if " at 0x" in text:
+        raise ValueError(f"Cannot fingerprint {text}")
+    return text
+
+
+def code_version(modules: Set[str]) -> str:
+    # Hashes the source of every top level package (or script) that the given modules belong to, skipping
+    # the standard library and installed packages, so any edit to the simulation code changes the key.
+    libraries = _library_paths()
+    files = set()
+    for name in modules:
+        module = sys.modules.get(name.split(".")[0])
+        if module is None:
+            continue
+        roots = list(getattr(module, "__path__", []))
+        if not roots and getattr(module, "__file__", None):
+            roots = [module.__file__]
+        for root in roots:
+            root = os.path.realpath(root)
+            if any(root.startswith(library) for library in libraries):
+                continue
+            if os.path.isfile(root):
+                files.add(root)
+                continue
+            for directory, _, names in os.walk(root):
+                files.update(os.path.join(directory, file) for file in names if file.endswith(".py"))
+
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(path.encode())
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    # A directory of engine checkpoints named by a hash of everything that determines what a run estimates:
+    # the trial function, its arguments, the discriminator and estimator options, and the source code they
+    # come from. Precision and stability targets are not part of the key, so asking again returns the stored
+    # estimate as soon as it satisfies them and asking for more carries on from it. Least recently used
+    # entries are removed once the directory passes max_bytes.
+    directory: str
+    max_bytes: int
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, func: Any, discriminator: Any, args: Any, **config: Any) -> str:
+        modules = {"montecarlo"}
+        description = fingerprint((func, discriminator, args, config), modules)
+        return hashlib.sha256(f"{description}\n{code_version(modules)}".encode()).hexdigest()
+
+    def path(self, func: Any, discriminator: Any, args: Any, **config: Any) -> str:
+        path = os.path.join(self.directory, self.key(func, discriminator, args, **config) + CACHE_SUFFIX)
+        if os.path.exists(path):
+            os.utime(path)
+        return path
+
+    def entries(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(CACHE_SUFFIX)]
+
+    def size(self) -> int:
+        return sum(entry.stat().st_size for entry in self.entries())
+
+    def evict(self, keep: Optional[str] = None):
+        entries = sorted(self.entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and os.path.realpath(entry.path) == os.path.realpath(keep):
+                continue
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def clear(self):
+        for entry in self.entries():
+            os.remove(entry.path)
+
+    def __repr__(self):
+        return f"ResultCache({self.directory!r}, {len(self.entries())} entries, max_bytes={self.max_bytes})"
+
@@ -0,0 +1,58 @@
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from montecarlo.stats import ResultStats, RunningStats
+from montecarlo.variance import AntitheticStats, ControlVariateStats
+
+
+class Checkpoint:
+    # estimator describes what the estimate was built for (see montecarlo.sim.estimator_config), so that a
+    # resume cannot merge trials of one kind into an estimator of another.
+    estimate: RunningStats | ControlVariateStats | AntitheticStats
+    results: List[Tuple[Any, ...]] | ResultStats
+    stability: int
+    required_confidence: int
+    round_number: int
+    seed: Optional[int]
+    estimator: Dict[str, Any]
+
+    def __init__(
+            self,
+            estimate: RunningStats | ControlVariateStats | AntitheticStats,
+            results: List[Tuple[Any, ...]] | ResultStats,
+            stability: int,
+            required_confidence: int,
+            round_number: int,
+            seed: Optional[int],
+            estimator: Dict[str, Any]
+    ):
+        self.estimate = estimate
+        self.results = results
+        self.stability = stability
+        self.required_confidence = required_confidence
+        self.round_number = round_number
+        self.seed = seed
+        self.estimator = estimator
+
+
+def save_checkpoint(path: str, checkpoint: Checkpoint):
+    # Written to a sibling file and swapped in, so a kill mid-write leaves the previous checkpoint intact. The
+    # sibling gets a unique name, so runs saving to the same path do not write into each other's.
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                             prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def load_checkpoint(path: str) -> Optional[Checkpoint]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,187 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+ENDIAN = "<" if sys.byteorder == "little" else ">"
+NPY_DESCR = {
+    "b": "|i1",
+    "h": f"{ENDIAN}i2",
+    "i": f"{ENDIAN}i4",
+    "q": f"{ENDIAN}i8",
+    "f": f"{ENDIAN}f4",
+    "d": f"{ENDIAN}f8",
+}
+# Fixed size .npy preamble, so the row count in the header can be rewritten in place as columns grow.
+NPY_HEADER_SIZE = 128
+
+
+def npy_header(typecode: str, rows: int) -> bytes:
+    header = f"{{'descr': '{NPY_DESCR[typecode]}', 'fortran_order': False, 'shape': ({rows},), }}"
+    preamble = b"\x93NUMPY\x01\x00" + struct.pack("<H", NPY_HEADER_SIZE - 10)
+    return preamble + header.encode("latin1").ljust(NPY_HEADER_SIZE - 11) + b"\n"
+
+
+def infer_typecodes(result: Tuple[Any, ...]) -> str:
+    # Floats are the safe default: a field that is an int on one trial may be a float on the next.
+    return "".join("b" if isinstance(value, bool) else "d" for value in result)
+
+
+class ColumnStore:
+    typecodes: Optional[str]
+    names: Optional[List[str]]
+    directory: Optional[str]
+    spill_rows: int
+    spilled: int
+    columns: List[array]
+
+    def __init__(self, typecodes: Optional[str] = None, names: Optional[Sequence[str]] = None,
+                 directory: Optional[str] = None, spill_rows: int = 100_000):
+        if typecodes is not None and names is not None and len(typecodes) != len(names):
+            raise ValueError("typecodes and names must have the same length")
+        self.typecodes = typecodes
+        self.names = list(names) if names is not None else None
+        self.directory = directory
+        self.spill_rows = spill_rows
+        self.spilled = 0
+        self.columns = []
+        self._maps: List[mmap.mmap] = []
+        if typecodes is not None:
+            self._create_columns()
+
+    def _create_columns(self):
+        unsupported = set(self.typecodes) - set(NPY_DESCR)
+        if unsupported:
+            raise ValueError(f"Unsupported column typecodes {''.join(sorted(unsupported))}")
+        if self.names is None:
+            self.names = [f"field_{index}" for index in range(len(self.typecodes))]
+        self.columns = [array(typecode) for typecode in self.typecodes]
+        if self.directory is not None:
+            # Existing column files are only marked empty, not truncated: a checkpoint being resumed into the
+            # same directory still needs the rows it spilled there, and flush overwrites whatever it does not.
+            os.makedirs(self.directory, exist_ok=True)
+            for index, typecode in enumerate(self.typecodes):
+                with open(self._path(index), "r+b" if os.path.exists(self._path(index)) else "wb") as f:
+                    f.write(npy_header(typecode, 0))
+            self._write_meta()
+
+    def _path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{self.names[index]}.npy")
+
+    def _write_meta(self):
+        with open(os.path.join(self.directory, "columns.json"), "w") as f:
+            json.dump({"typecodes": self.typecodes, "names": self.names, "rows": self.spilled}, f)
+
+    def push(self, result: Tuple[Any, ...]):
+        if self.typecodes is None:
+            self.typecodes = infer_typecodes(result)
+            self._create_columns()
+        for column, value in zip(self.columns, result):
+            column.append(value)
+        if self.directory is not None and len(self.columns[0]) >= self.spill_rows:
+            self.flush()
+
+    def merge(self, other: "ColumnStore"):
+        if other.spilled:
+            raise ValueError("Only in-memory column stores can be merged into another store")
+        if not other.columns:
+            return
+        if self.typecodes is None:
+            self.typecodes = other.typecodes
+            self._create_columns()
+        for column, other_column in zip(self.columns, other.columns):
+            if column.typecode == other_column.typecode:
+                column.extend(other_column)
+            else:
+                column.extend(array(column.typecode, other_column))
+        if self.directory is not None and len(self.columns[0]) >= self.spill_rows:
+            self.flush()
+
+    def flush(self):
+        if self.directory is None or not self.columns or not len(self.columns[0]):
+            return
+        rows = self.spilled + len(self.columns[0])
+        for index, column in enumerate(self.columns):
+            with open(self._path(index), "r+b") as f:
+                f.seek(NPY_HEADER_SIZE + column.itemsize * self.spilled)
+                column.tofile(f)
+                f.truncate()
+                f.seek(0)
+                f.write(npy_header(column.typecode, rows))
+            del column[:]
+        self.spilled = rows
+        self._write_meta()
+
+    def __len__(self):
+        return self.spilled + (len(self.columns[0]) if self.columns else 0)
+
+    def column(self, index: int | str) -> Sequence[int | float]:
+        if isinstance(index, str):
+            index = self.names.index(index)
+        if self.directory is None:
+            return self.columns[index]
+        self.flush()
+        typecode = self.typecodes[index]
+        size = array(typecode).itemsize * self.spilled
+        if size == 0:
+            return array(typecode)
+        with open(self._path(index), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped)[NPY_HEADER_SIZE:NPY_HEADER_SIZE + size].cast(typecode)
+
+    def as_dict(self) -> Dict[str, Sequence[int | float]]:
+        return {name: self.column(index) for index, name in enumerate(self.names or [])}
+
+    def rows(self) -> Iterator[Tuple[int | float, ...]]:
+        return zip(*(self.column(index) for index in range(len(self.columns))))
+
+    def close(self):
+        self.flush()
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # A column view is still held; the mapping goes when it does.
+                pass
+        self._maps = []
+
+    @classmethod
+    def open(cls, directory: str, spill_rows: int = 100_000) -> "ColumnStore":
+        with open(os.path.join(directory, "columns.json")) as f:
+            meta = json.load(f)
+        store = cls.__new__(cls)
+        store.typecodes = meta["typecodes"]
+        store.names = meta["names"]
+        store.directory = directory
+        store.spill_rows = spill_rows
+        store.spilled = meta["rows"]
+        store.columns = [array(typecode) for typecode in store.typecodes]
+        store._maps = []
+        store._truncate()
+        return store
+
+    def _truncate(self):
+        # Drops anything written after the row count was last recorded, e.g. by a run killed mid-flush.
+        for index, typecode in enumerate(self.typecodes):
+            with open(self._path(index), "r+b") as f:
+                f.truncate(NPY_HEADER_SIZE + array(typecode).itemsize * self.spilled)
+                f.write(npy_header(typecode, self.spilled))
+
+    def __getstate__(self):
+        # Pickling a disk-backed store (as checkpoints do) spills it and keeps only the location and row count.
+        self.flush()
+        state = self.__dict__.copy()
+        state["_maps"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.directory is not None and self.typecodes is not None:
+            self._truncate()
+
+    def __repr__(self):
+        return f"ColumnStore({len(self)} rows, typecodes={self.typecodes!r}, directory={self.directory!r})"
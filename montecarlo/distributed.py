@@ -0,0 +1,187 @@
+import argparse
+import os
+import pickle
+import queue
+import threading
+from multiprocessing import Process
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+
+class _Task:
+    batch: "queue.Queue[Tuple[int, bool, Any]]"
+    index: int
+    func: Callable[..., Any]
+    args: Tuple[Any, ...]
+
+    def __init__(self, batch: "queue.Queue[Tuple[int, bool, Any]]", index: int, func: Callable[..., Any],
+                 args: Tuple[Any, ...]):
+        self.batch = batch
+        self.index = index
+        self.func = func
+        self.args = args
+
+
+class Coordinator:
+    # Stands in for a multiprocessing.Pool: map and starmap hand each call to whichever connected worker is
+    # free, over multiprocessing.connection sockets. Workers may join at any time, and a task whose worker
+    # disconnects before answering goes back on the queue for the next free one.
+    # Both ends unpickle whatever they are sent, so the authkey is all that keeps anyone else from running
+    # code on them: without one a random key is made, which spawn_local_workers hands on and remote workers
+    # are given as authkey.hex().
+    address: Tuple[str, int]
+
+    def __init__(self, address: Tuple[str, int] = ("localhost", 0), authkey: Optional[bytes] = None):
+        authkey = authkey if authkey is not None else os.urandom(32)
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.authkey = authkey
+        self.tasks: "queue.Queue[Optional[_Task]]" = queue.Queue()
+        self.connections: List[Connection] = []
+        self.lock = threading.Lock()
+        self.closed = False
+        self.joined = threading.Condition(self.lock)
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def processes(self) -> int:
+        with self.lock:
+            return len(self.connections)
+
+    def wait_for_workers(self, count: int, timeout: Optional[float] = None) -> bool:
+        with self.joined:
+            return self.joined.wait_for(lambda: len(self.connections) >= count, timeout)
+
+    def _accept(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError):
+                if self.closed:
+                    return
+                continue
+            with self.joined:
+                self.connections.append(connection)
+                self.joined.notify_all()
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection: Connection):
+        try:
+            while True:
+                task = self.tasks.get()
+                if task is None:
+                    connection.send(("stop",))
+                    return
+                try:
+                    connection.send(("call", task.func, task.args))
+                except (pickle.PicklingError, TypeError, AttributeError) as e:
+                    # The task could not be sent at all, which no other worker would fare better with; the
+                    # connection is still good, as nothing was written to it.
+                    task.batch.put((task.index, False, e))
+                    continue
+                except (OSError, EOFError):
+                    self.tasks.put(task)
+                    return
+                try:
+                    succeeded, value = connection.recv()
+                except (OSError, EOFError):
+                    self.tasks.put(task)
+                    return
+                task.batch.put((task.index, succeeded, value))
+        except (OSError, EOFError):
+            pass
+        finally:
+            with self.lock:
+                if connection in self.connections:
+                    self.connections.remove(connection)
+            connection.close()
+
+    def _submit(self, func: Callable[..., Any], iterable: Iterable[Tuple[Any, ...]]
+                ) -> Tuple["queue.Queue[Tuple[int, bool, Any]]", int]:
+        if self.closed:
+            raise ValueError("Coordinator is closed")
+        batch: "queue.Queue[Tuple[int, bool, Any]]" = queue.Queue()
+        count = 0
+        for index, args in enumerate(iterable):
+            self.tasks.put(_Task(batch, index, func, tuple(args)))
+            count += 1
+        return batch, count
+
+    def starmap(self, func: Callable[..., Any], iterable: Iterable[Tuple[Any, ...]]) -> List[Any]:
+        batch, count = self._submit(func, iterable)
+        results: List[Any] = [None] * count
+        for _ in range(count):
+            index, succeeded, value = batch.get()
+            if not succeeded:
+                raise value
+            results[index] = value
+        return results
+
+    def map(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> List[Any]:
+        return self.starmap(func, ((item,) for item in iterable))
+
+    def imap(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> Iterable[Any]:
+        return iter(self.map(func, iterable))
+
+    def imap_unordered(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> Iterator[Any]:
+        # The tasks are queued straight away; the results come back as workers finish them.
+        batch, count = self._submit(func, ((item,) for item in iterable))
+
+        def results() -> Iterator[Any]:
+            for _ in range(count):
+                _, succeeded, value = batch.get()
+                if not succeeded:
+                    raise value
+                yield value
+        return results()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for _ in range(self.processes):
+            self.tasks.put(None)
+        self.listener.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def serve(address: Tuple[str, int], authkey: bytes):
+    with Client(address, authkey=authkey) as connection:
+        while True:
+            try:
+                message = connection.recv()
+            except EOFError:
+                return
+            if message[0] == "stop":
+                return
+            _, func, args = message
+            try:
+                reply = (True, func(*args))
+            except Exception as e:
+                reply = (False, e)
+            try:
+                connection.send(reply)
+            except (pickle.PicklingError, TypeError, AttributeError) as e:
+                connection.send((False, RuntimeError(f"Could not send back the result of {func!r}: {e}")))
+
+
+def spawn_local_workers(coordinator: Coordinator, count: int) -> List[Process]:
+    workers = [Process(target=serve, args=(coordinator.address, coordinator.authkey), daemon=True)
+               for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a Monte Carlo worker node for a remote Coordinator")
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--authkey", required=True, help="the coordinator's authkey, in hex")
+    options = parser.parse_args()
+    serve((options.host, options.port), bytes.fromhex(options.authkey))
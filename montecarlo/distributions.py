@@ -0,0 +1,337 @@
+import math
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from montecarlo.stats import RunningStats
+
+
+class Histogram:
+    # Exact counts of integer outcomes (turns, tanks destroyed, wins). Merging adds the counts.
+    counts: Dict[int, int]
+    count: int
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+
+    def push(self, value: int, weight: int = 1):
+        self.counts[value] = self.counts.get(value, 0) + weight
+        self.count += weight
+
+    def merge(self, other: "Histogram"):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self.count += other.count
+
+    def probability(self, value: int) -> float:
+        return self.counts.get(value, 0) / self.count if self.count else 0.0
+
+    def cdf(self, value: int | float) -> float:
+        if not self.count:
+            return 0.0
+        return sum(count for outcome, count in self.counts.items() if outcome <= value) / self.count
+
+    def quantile(self, q: float) -> int:
+        if not self.count:
+            raise ValueError("Quantile of an empty histogram")
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        rank = q * self.count
+        seen = 0
+        for value, count in self.items():
+            seen += count
+            if seen >= rank:
+                return value
+        return max(self.counts)
+
+    @property
+    def mean(self) -> float:
+        return sum(value * count for value, count in self.counts.items()) / self.count if self.count else 0.0
+
+    @property
+    def distinct(self) -> int:
+        return len(self.counts)
+
+    def items(self) -> List[Tuple[int, int]]:
+        return sorted(self.counts.items())
+
+    def table(self) -> List[Tuple[int, float]]:
+        # Outcome against percentage of trials, in outcome order.
+        return [(value, 100 * count / self.count) for value, count in self.items()]
+
+    def __repr__(self):
+        return f"Histogram({dict(self.items())!r})"
+
+
+class QuantileSketch:
+    # A mergeable quantile sketch for continuous outcomes (DDSketch): values are counted in logarithmic
+    # buckets, so every quantile it reports is within relative_accuracy of a value at that rank, and two
+    # sketches with the same accuracy merge by adding bucket counts. Memory grows with the log of the
+    # range of values seen, not with the number of trials; past max_buckets the buckets nearest zero are
+    # folded together, so only the accuracy of the smallest magnitudes is given up.
+    relative_accuracy: float
+    max_buckets: int
+    positive: Dict[int, int]
+    negative: Dict[int, int]
+    zero: int
+    count: int
+    minimum: float
+    maximum: float
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def _index(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def push(self, value: int | float, weight: int = 1):
+        if value > 0:
+            index = self._index(value)
+            self.positive[index] = self.positive.get(index, 0) + weight
+            if len(self.positive) > self.max_buckets:
+                self._collapse(self.positive)
+        elif value < 0:
+            index = self._index(-value)
+            self.negative[index] = self.negative.get(index, 0) + weight
+            if len(self.negative) > self.max_buckets:
+                self._collapse(self.negative)
+        else:
+            self.zero += weight
+        self.count += weight
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def _collapse(self, buckets: Dict[int, int]):
+        indices = sorted(buckets)
+        excess = len(indices) - self.max_buckets
+        folded = sum(buckets.pop(index) for index in indices[:excess])
+        buckets[indices[excess]] += folded
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative_accuracy can be merged")
+        for buckets, other_buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_buckets.items():
+                buckets[index] = buckets.get(index, 0) + count
+            if len(buckets) > self.max_buckets:
+                self._collapse(buckets)
+        self.zero += other.zero
+        self.count += other.count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def _buckets(self) -> Iterator[Tuple[float, int]]:
+        # (representative value, count) in ascending order of value.
+        for index in sorted(self.negative, reverse=True):
+            yield -self._value(index), self.negative[index]
+        if self.zero:
+            yield 0.0, self.zero
+        for index in sorted(self.positive):
+            yield self._value(index), self.positive[index]
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            raise ValueError("Quantile of an empty sketch")
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if q == 0:
+            return self.minimum
+        if q == 1:
+            return self.maximum
+        rank = q * self.count
+        seen = 0
+        for value, count in self._buckets():
+            seen += count
+            if seen >= rank:
+                return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        return [self.quantile(q) for q in qs]
+
+    def items(self) -> List[Tuple[float, int]]:
+        return list(self._buckets())
+
+    def cdf(self, value: float) -> float:
+        if not self.count:
+            return 0.0
+        return sum(count for bucket, count in self._buckets() if bucket <= value) / self.count
+
+    @property
+    def mean(self) -> float:
+        # Approximate, from the bucket values; Distribution keeps the exact mean alongside.
+        return sum(value * count for value, count in self._buckets()) / self.count if self.count else 0.0
+
+    def table(self) -> List[Tuple[float, float]]:
+        # Bucket value against percentage of trials, in value order.
+        return [(value, 100 * count / self.count) for value, count in self._buckets()]
+
+    def __repr__(self):
+        return (f"QuantileSketch(count={self.count}, relative_accuracy={self.relative_accuracy}, "
+                f"buckets={len(self.positive) + len(self.negative) + bool(self.zero)})")
+
+
+class Distribution:
+    # The distribution of one field. Counts are exact while every value is an integer and there are at most
+    # exact_limit distinct values; the first value that breaks either rule moves the counts into a
+    # QuantileSketch for good. The mean and variance are exact either way.
+    exact_limit: int
+    relative_accuracy: float
+    stats: RunningStats
+    histogram: Optional[Histogram]
+    sketch: Optional[QuantileSketch]
+
+    def __init__(self, exact_limit: int = 256, relative_accuracy: float = 0.01):
+        self.exact_limit = exact_limit
+        self.relative_accuracy = relative_accuracy
+        self.stats = RunningStats()
+        self.histogram = Histogram()
+        self.sketch = None
+
+    @property
+    def exact(self) -> bool:
+        return self.histogram is not None
+
+    def _to_sketch(self):
+        self.sketch = QuantileSketch(self.relative_accuracy)
+        for value, count in self.histogram.items():
+            self.sketch.push(value, count)
+        self.histogram = None
+
+    def push(self, value: int | float):
+        self.stats.push(value)
+        if self.histogram is not None:
+            if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+                value = int(value)
+                if value in self.histogram.counts or self.histogram.distinct < self.exact_limit:
+                    self.histogram.push(value)
+                    return
+            self._to_sketch()
+        self.sketch.push(value)
+
+    def merge(self, other: "Distribution"):
+        self.stats.merge(other.stats)
+        if self.histogram is not None and other.histogram is not None:
+            self.histogram.merge(other.histogram)
+            if self.histogram.distinct <= self.exact_limit:
+                return
+            self._to_sketch()
+            return
+        if self.histogram is not None:
+            self._to_sketch()
+        if other.histogram is not None:
+            for value, count in other.histogram.items():
+                self.sketch.push(value, count)
+        else:
+            self.sketch.merge(other.sketch)
+
+    @property
+    def count(self) -> int:
+        return self.stats.count
+
+    @property
+    def mean(self) -> float:
+        return self.stats.mean
+
+    @property
+    def variance(self) -> float:
+        return self.stats.variance
+
+    @property
+    def std(self) -> float:
+        return self.stats.std
+
+    def quantile(self, q: float) -> int | float:
+        return self.histogram.quantile(q) if self.histogram is not None else self.sketch.quantile(q)
+
+    def quantiles(self, qs: Sequence[float]) -> List[int | float]:
+        return [self.quantile(q) for q in qs]
+
+    @property
+    def median(self) -> int | float:
+        return self.quantile(0.5)
+
+    def cdf(self, value: int | float) -> float:
+        return self.histogram.cdf(value) if self.histogram is not None else self.sketch.cdf(value)
+
+    def items(self) -> List[Tuple[int | float, int]]:
+        # (value, count) in value order: exact values, or the sketch's bucket values.
+        return self.histogram.items() if self.histogram is not None else self.sketch.items()
+
+    def table(self) -> List[Tuple[int | float, float]]:
+        return self.histogram.table() if self.histogram is not None else self.sketch.table()
+
+    def __repr__(self):
+        return f"Distribution(mean={self.mean}, {self.histogram if self.histogram is not None else self.sketch!r})"
+
+
+class Distributions:
+    # A result sink, like ResultStats, that keeps the distribution of every field of each result rather than
+    # the results themselves. Pass one as an engine's store: each worker chunk fills its own empty() copy and
+    # the parent merges them, so only bucket counts cross the process boundary.
+    names: Optional[List[str]]
+    exact_limit: int
+    relative_accuracy: float
+    fields: List[Distribution]
+
+    def __init__(self, names: Optional[Sequence[str]] = None, exact_limit: int = 256,
+                 relative_accuracy: float = 0.01):
+        self.names = list(names) if names is not None else None
+        self.exact_limit = exact_limit
+        self.relative_accuracy = relative_accuracy
+        self.fields = [self._new_field() for _ in self.names or ()]
+
+    def _new_field(self) -> Distribution:
+        return Distribution(self.exact_limit, self.relative_accuracy)
+
+    def empty(self) -> "Distributions":
+        return Distributions(self.names, self.exact_limit, self.relative_accuracy)
+
+    def push(self, result: Tuple[int | float, ...]):
+        if not self.fields:
+            self.fields = [self._new_field() for _ in result]
+        for field, value in zip(self.fields, result):
+            field.push(value)
+
+    def merge(self, other: "Distributions"):
+        if not self.fields:
+            self.fields = [self._new_field() for _ in other.fields]
+        for field, other_field in zip(self.fields, other.fields):
+            field.merge(other_field)
+
+    @property
+    def count(self) -> int:
+        return self.fields[0].count if self.fields else 0
+
+    def __getitem__(self, index: int | str) -> Distribution:
+        if isinstance(index, str):
+            if self.names is None:
+                raise KeyError(index)
+            index = self.names.index(index)
+        return self.fields[index]
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __repr__(self):
+        if self.names is not None:
+            return f"Distributions({dict(zip(self.names, self.fields))!r})"
+        return f"Distributions({self.fields!r})"
@@ -0,0 +1,161 @@
+import math
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from montecarlo.stats import RunningStats
+
+# Categories expected to hold fewer trials than this are pooled with their neighbours before a chi-square test.
+MIN_EXPECTED = 5
+
+
+class TestResult:
+    name: str
+    test: str
+    statistic: float
+    p_value: float
+    rejected: bool
+
+    def __init__(self, name: str, test: str, statistic: float, p_value: float):
+        self.name = name
+        self.test = test
+        self.statistic = statistic
+        self.p_value = p_value
+        self.rejected = False
+
+    def __repr__(self):
+        verdict = "DIFFERENT" if self.rejected else "ok"
+        return f"TestResult({self.name} {self.test}: statistic {self.statistic:.4g}, p {self.p_value:.4g}, {verdict})"
+
+
+def _regularized_gamma_q(a: float, x: float) -> float:
+    # Q(a, x) = Γ(a, x) / Γ(a): by its series below a + 1 and by Lentz's continued fraction above.
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 10_000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return min(1.0, math.exp(log_prefix) * h)
+
+
+def chi_square_sf(statistic: float, df: int) -> float:
+    if df <= 0:
+        return 1.0
+    return _regularized_gamma_q(df / 2, statistic / 2)
+
+
+def _pool(table: List[Tuple[float, int, int]], smaller: int, total: int) -> List[Tuple[int, int]]:
+    # Merges neighbouring categories, in value order, until every cell of the two-row table expects at least
+    # MIN_EXPECTED trials.
+    cells: List[Tuple[int, int]] = []
+    a = b = 0
+    for _, count_a, count_b in table:
+        a += count_a
+        b += count_b
+        if (a + b) * smaller / total >= MIN_EXPECTED:
+            cells.append((a, b))
+            a = b = 0
+    if a or b:
+        if cells:
+            last_a, last_b = cells.pop()
+            cells.append((last_a + a, last_b + b))
+        else:
+            cells.append((a, b))
+    return cells
+
+
+def chi_square_homogeneity(name: str, counts_a: Iterable[Tuple[float, int]],
+                           counts_b: Iterable[Tuple[float, int]]) -> TestResult:
+    # Whether two samples of a discrete outcome (or two sketches' buckets) come from the same distribution,
+    # by Pearson's chi-square test on their contingency table.
+    merged: Dict[float, List[int]] = {}
+    for value, count in counts_a:
+        merged.setdefault(value, [0, 0])[0] += count
+    for value, count in counts_b:
+        merged.setdefault(value, [0, 0])[1] += count
+    table = [(value, a, b) for value, (a, b) in sorted(merged.items())]
+    n_a = sum(a for _, a, _ in table)
+    n_b = sum(b for _, _, b in table)
+    if not n_a or not n_b:
+        raise ValueError(f"{name}: both samples need trials")
+    total = n_a + n_b
+
+    cells = _pool(table, min(n_a, n_b), total)
+    statistic = 0.0
+    for a, b in cells:
+        column = a + b
+        expected_a = column * n_a / total
+        expected_b = column * n_b / total
+        statistic += (a - expected_a) ** 2 / expected_a + (b - expected_b) ** 2 / expected_b
+    return TestResult(name, "chi-square", statistic, chi_square_sf(statistic, len(cells) - 1))
+
+
+def welch_test(name: str, a: RunningStats, b: RunningStats) -> TestResult:
+    # Whether two independent samples share a mean; with the sample sizes here the normal approximation to
+    # Welch's t is exact enough.
+    standard_error = math.sqrt(a.variance / a.count + b.variance / b.count) if a.count and b.count else 0.0
+    if standard_error == 0:
+        same = a.mean == b.mean
+        return TestResult(name, "welch", 0.0 if same else math.inf, 1.0 if same else 0.0)
+    z = (a.mean - b.mean) / standard_error
+    return TestResult(name, "welch", z, 2 * (1 - NormalDist().cdf(abs(z))))
+
+
+def paired_test(name: str, differences: RunningStats) -> TestResult:
+    # Whether per-seed differences between two implementations average zero. Under common seeds the runs
+    # stay correlated for as long as they draw the same random numbers, which makes this far more sensitive
+    # than comparing independent samples.
+    if differences.count < 2 or differences.variance == 0:
+        same = differences.mean == 0
+        return TestResult(name, "paired", 0.0 if same else math.inf, 1.0 if same else 0.0)
+    z = differences.mean / (differences.std / math.sqrt(differences.count))
+    return TestResult(name, "paired", z, 2 * (1 - NormalDist().cdf(abs(z))))
+
+
+def holm(results: Sequence[TestResult], alpha: float = 0.01) -> List[TestResult]:
+    # Holm's step-down correction: marks which results to reject so that the chance of any false alarm
+    # across the whole family stays at most alpha, however many tests it holds.
+    if not 0 < alpha < 1:
+        raise ValueError("alpha must be between 0 and 1")
+    ordered = sorted(results, key=lambda result: result.p_value)
+    for rank, result in enumerate(ordered):
+        if result.p_value > alpha / (len(ordered) - rank):
+            break
+        result.rejected = True
+    return list(results)
+
+
+def running_stats(count: int, mean: float, variance: float, minimum: Optional[float] = None,
+                  maximum: Optional[float] = None) -> RunningStats:
+    # Rebuilds the RunningStats a stored reference was summarised from.
+    stats = RunningStats()
+    stats.count = count
+    stats.mean = mean
+    stats.m2 = variance * (count - 1) if count > 1 else 0.0
+    if minimum is not None:
+        stats.minimum = minimum
+    if maximum is not None:
+        stats.maximum = maximum
+    return stats
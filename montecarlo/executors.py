@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from concurrent.futures import InterpreterPoolExecutor
+except ImportError:
+    InterpreterPoolExecutor = None
+
+
+class SerialExecutor:
+    # Runs every call in the calling process, in order. The baseline for the other executors, and the
+    # quickest when trials are so cheap that any dispatch costs more than it saves.
+    processes = 1
+    shares_globals = False
+
+    def starmap(self, func: Callable[..., Any], iterable: Iterable[Tuple[Any, ...]]) -> List[Any]:
+        return [func(*args) for args in iterable]
+
+    def map(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> List[Any]:
+        return [func(item) for item in iterable]
+
+    def imap(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> Iterator[Any]:
+        return (func(item) for item in iterable)
+
+    def imap_unordered(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> Iterator[Any]:
+        return self.imap(func, iterable)
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class FuturesExecutor:
+    # Gives a concurrent.futures executor the Pool methods the engine dispatches through. Calls share
+    # the interpreter with the parent under threads, so a seeded run reseeds one global generator from
+    # several threads at once and is no longer reproducible; it is still a valid sample. shares_globals says
+    # whether calls run at once against the parent's module globals, as they do under threads but not in
+    # subinterpreters; the engine refuses anything that keeps per-trial state there under such an executor.
+    processes: int
+    shares_globals: bool
+
+    def __init__(self, executor: Executor, workers: int, shares_globals: bool = False):
+        self.executor = executor
+        self.processes = workers
+        self.shares_globals = shares_globals
+
+    def starmap(self, func: Callable[..., Any], iterable: Iterable[Tuple[Any, ...]]) -> List[Any]:
+        return [future.result() for future in [self.executor.submit(func, *args) for args in iterable]]
+
+    def map(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> List[Any]:
+        return self.starmap(func, ((item,) for item in iterable))
+
+    def imap(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> Iterator[Any]:
+        futures = [self.executor.submit(func, item) for item in iterable]
+        return (future.result() for future in futures)
+
+    def imap_unordered(self, func: Callable[[Any], Any], iterable: Iterable[Any]) -> Iterator[Any]:
+        futures = [self.executor.submit(func, item) for item in iterable]
+        return (future.result() for future in as_completed(futures))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def join(self):
+        self.executor.shutdown(wait=True)
+
+
+def serial_executor(workers: Optional[int] = None) -> SerialExecutor:
+    return SerialExecutor()
+
+
+def thread_executor(workers: Optional[int] = None) -> FuturesExecutor:
+    # Only worth it on a free-threaded build, or when trials spend their time outside the GIL.
+    workers = workers or os.cpu_count() or 1
+    return FuturesExecutor(ThreadPoolExecutor(workers, thread_name_prefix="montecarlo"), workers, shares_globals=True)
+
+
+def process_executor(workers: Optional[int] = None, start_method: Optional[str] = None, **pool_options: Any) -> Any:
+    # A multiprocessing.Pool from the given start method's context ("fork", "spawn" or "forkserver"), so
+    # the same engine can be tried with each.
+    context = multiprocessing.get_context(start_method)
+    return context.Pool(workers or os.cpu_count() or 1, **pool_options)
+
+
+def subinterpreter_executor(workers: Optional[int] = None) -> FuturesExecutor:
+    # Each worker is an isolated interpreter in this process with its own GIL (Python 3.14+).
+    if InterpreterPoolExecutor is None:
+        raise RuntimeError("Subinterpreter executors need concurrent.futures.InterpreterPoolExecutor (Python 3.14+)")
+    workers = workers or os.cpu_count() or 1
+    return FuturesExecutor(InterpreterPoolExecutor(workers), workers)
+
+
+EXECUTORS = {
+    "serial": serial_executor,
+    "thread": thread_executor,
+    "process": process_executor,
+    "subinterpreter": subinterpreter_executor,
+}
+
+
+def available_executors() -> List[str]:
+    return [name for name in EXECUTORS if name != "subinterpreter" or InterpreterPoolExecutor is not None]
+
+
+def make_executor(name: str, workers: Optional[int] = None, **options: Any) -> Any:
+    if name not in EXECUTORS:
+        raise ValueError(f"Unknown executor {name!r}, expected one of {', '.join(EXECUTORS)}")
+    return EXECUTORS[name](workers, **options)
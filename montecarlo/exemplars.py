@@ -0,0 +1,160 @@
+import inspect
+import random
+import threading
+from bisect import insort
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from montecarlo.rng import seed_global
+
+Result = Tuple[int | float, ...]
+
+# Replays reseed the process's one global generator, so runs finishing side by side on different threads
+# take turns.
+_replaying = threading.Lock()
+
+
+def takes_keyword(func: Callable[..., Any], name: str) -> bool:
+    # Whether func can be called with name as a keyword argument; a callable whose signature cannot be read is
+    # taken not to.
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(parameter.kind is inspect.Parameter.VAR_KEYWORD
+               or (parameter.name == name and parameter.kind is not inspect.Parameter.POSITIONAL_ONLY)
+               for parameter in parameters)
+
+
+class Exemplar:
+    # One kept trial: the seed its generator was reset to, the keyword arguments it was called with and its
+    # result. logs is filled in by Exemplars.replay, and reproduced says whether the replay gave the same result.
+    seed: int
+    result: Result
+    kwargs: Dict[str, Any]
+    logs: Optional[List[Any]]
+    reproduced: Optional[bool]
+
+    def __init__(self, seed: int, result: Result, kwargs: Dict[str, Any]):
+        self.seed = seed
+        self.result = result
+        self.kwargs = kwargs
+        self.logs = None
+        self.reproduced = None
+
+    def __lt__(self, other: "Exemplar") -> bool:
+        return self.seed < other.seed
+
+    def __repr__(self):
+        lines = f", {len(self.logs)} log lines" if self.logs is not None else ""
+        return f"Exemplar(seed={self.seed}, result={self.result!r}{lines})"
+
+
+class Reservoir:
+    # A uniform sample of at most size of the trials offered to it. Every trial's seed is itself uniformly
+    # random, so keeping the size smallest seeds is a sample without drawing anything more, and two
+    # reservoirs merge by keeping the smallest of both.
+    size: int
+    seen: int
+    kept: List[Exemplar]
+
+    def __init__(self, size: int):
+        self.size = size
+        self.seen = 0
+        self.kept = []
+
+    def offer(self, exemplar: Exemplar):
+        self.seen += 1
+        if len(self.kept) < self.size:
+            insort(self.kept, exemplar)
+        elif exemplar.seed < self.kept[-1].seed:
+            insort(self.kept, exemplar)
+            self.kept.pop()
+
+    def merge(self, other: "Reservoir"):
+        self.seen += other.seen
+        self.kept = sorted(self.kept + other.kept)[:self.size]
+
+    def __iter__(self):
+        return iter(self.kept)
+
+    def __len__(self):
+        return len(self.kept)
+
+    def __repr__(self):
+        return f"Reservoir({len(self.kept)} of {self.seen} trials)"
+
+
+class Exemplars:
+    # Keeps a few example trials to look at after a run, at a memory cost that does not grow with the number
+    # of trials: a reservoir of size trials drawn from all of them, and one as large for each category, drawn
+    # from the trials whose result its predicate accepts (module level functions, so that workers can be sent
+    # them). Pass one to an engine and it is filled in place.
+    # Each trial's generator is reset from a seed drawn before it, which changes the random numbers a seeded
+    # run sees, and only the kept seeds and results are held. At the end of the run the engine replays the
+    # kept trials in the parent, calling func with a fresh list as its detail keyword argument for the trial
+    # to write its log into, so that only those trials pay for a detailed log.
+    size: int
+    categories: Dict[str, Callable[[Result], bool]]
+    detail: Optional[str]
+    sample: Reservoir
+    by_category: Dict[str, Reservoir]
+
+    def __init__(self, size: int = 10, categories: Optional[Dict[str, Callable[[Result], bool]]] = None,
+                 detail: Optional[str] = "logs"):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.categories = dict(categories or {})
+        self.detail = detail
+        self.sample = Reservoir(size)
+        self.by_category = {name: Reservoir(size) for name in self.categories}
+
+    def empty(self) -> "Exemplars":
+        return Exemplars(self.size, self.categories, self.detail)
+
+    def call(self, func: Callable[..., Result], *args: Any, **kwargs: Any) -> Result:
+        seed = random.getrandbits(64)
+        seed_global(seed)
+        result = func(*args, **kwargs)
+        self.offer(Exemplar(seed, result, kwargs))
+        return result
+
+    def offer(self, exemplar: Exemplar):
+        self.sample.offer(exemplar)
+        for name, predicate in self.categories.items():
+            if predicate(exemplar.result):
+                self.by_category[name].offer(exemplar)
+
+    def merge(self, other: "Exemplars"):
+        self.sample.merge(other.sample)
+        for name, reservoir in other.by_category.items():
+            self.by_category[name].merge(reservoir)
+
+    def kept(self) -> Iterable[Exemplar]:
+        # Every kept trial once, though it may be in several reservoirs.
+        unique = {id(exemplar): exemplar for exemplar in self.sample}
+        for reservoir in self.by_category.values():
+            unique.update((id(exemplar), exemplar) for exemplar in reservoir)
+        return unique.values()
+
+    def replay(self, func: Callable[..., Result], args: Iterable[Any] = (), kwargs: Optional[Dict[str, Any]] = None):
+        # Reruns each kept trial from its seed, leaving this process's generator as it found it.
+        if self.detail is None:
+            return
+        with _replaying:
+            state = random.getstate()
+            try:
+                for exemplar in self.kept():
+                    exemplar.logs = []
+                    seed_global(exemplar.seed)
+                    result = func(*args, **{**(kwargs or {}), **exemplar.kwargs, self.detail: exemplar.logs})
+                    exemplar.reproduced = result == exemplar.result
+            finally:
+                random.setstate(state)
+
+    def __getitem__(self, category: str) -> Reservoir:
+        return self.by_category[category]
+
+    def __repr__(self):
+        categories = "".join(f", {name}={reservoir!r}" for name, reservoir in self.by_category.items())
+        return f"Exemplars(sample={self.sample!r}{categories})"
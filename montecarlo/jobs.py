@@ -0,0 +1,137 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from multiprocessing import Pool
+from typing import Any, Callable, Optional, Tuple
+
+from montecarlo.progress import RoundEvent
+from montecarlo.sim import Mean, Results, monte_carlo_self_stabalising_parallel, roll_die, die_discriminator
+from montecarlo.stopping import Precision
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class SimulationJob:
+    # The engine runs on a runner thread and reports back through its progress hook; that hook is also where
+    # a requested cancellation takes effect, so a job stops at the end of its current round. A cancel that
+    # only arrives with the final event is too late to save anything, and the finished result is kept. The
+    # chunks the engine had already started on the shared pool for the next round are not stopped: they run
+    # to the end in the background, ahead of the next job's chunks, and their results are dropped.
+    latest: Optional[RoundEvent]
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, progress: Optional[Callable[[RoundEvent], None]] = None):
+        self.loop = loop
+        self.progress = progress
+        self.latest = None
+        self.future: Optional[asyncio.Future] = None
+        self._cancel_requested = False
+        self._update = asyncio.Event()
+
+    @property
+    def estimate(self) -> Optional[Mean]:
+        return self.latest.estimate if self.latest else None
+
+    @property
+    def interval(self) -> Optional[float | dict]:
+        return self.latest.interval if self.latest else None
+
+    @property
+    def trials(self) -> int:
+        return self.latest.trials if self.latest else 0
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def cancel(self):
+        self._cancel_requested = True
+
+    def _on_event(self, event: RoundEvent):
+        if self.progress:
+            self.progress(event)
+        self.loop.call_soon_threadsafe(self._publish, event)
+        if self._cancel_requested and not event.finished:
+            raise JobCancelled()
+
+    def _publish(self, event: RoundEvent):
+        self.latest = event
+        update, self._update = self._update, asyncio.Event()
+        update.set()
+
+    async def wait_until(self, predicate: Callable[[RoundEvent], bool]) -> Optional[RoundEvent]:
+        while self.latest is None or not predicate(self.latest):
+            if self.future.done():
+                await self.result()
+                return self.latest
+            waiter = asyncio.ensure_future(self._update.wait())
+            await asyncio.wait((waiter, self.future), return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+        return self.latest
+
+    async def result(self) -> Tuple[Mean, Results]:
+        try:
+            return await self.future
+        except JobCancelled:
+            raise asyncio.CancelledError() from None
+
+    def __await__(self):
+        return self.result().__await__()
+
+
+class JobRunner:
+    # Every job submitted to a runner shares its one Pool, so starting a job costs a thread, not a Pool().
+    # With an in-process pool (the serial or thread executor) the jobs' trials run on runner threads, beyond
+    # the reach of a trial_timeout's alarm and beside each other's generator and module globals.
+    def __init__(self, processes: Optional[int] = None, pool: Optional[Any] = None, max_jobs: int = 8):
+        self.owns_pool = pool is None
+        self.pool = Pool(processes or os.cpu_count() or 1) if pool is None else pool
+        self.executor = ThreadPoolExecutor(max_jobs, thread_name_prefix="montecarlo-job")
+
+    def submit(
+            self,
+            func: Callable[..., Tuple[int | float, ...]],
+            discriminator: Callable[[Tuple[int | float]], int | float],
+            *args: Any,
+            required_confidence: int = 3,
+            required_stability: int = 10,
+            iterations_per_round: int = 1000,
+            progress: Optional[Callable[[RoundEvent], None]] = None,
+            **options: Any
+    ) -> SimulationJob:
+        loop = asyncio.get_running_loop()
+        job = SimulationJob(loop, progress)
+        run = partial(
+            monte_carlo_self_stabalising_parallel,
+            func, discriminator, required_confidence, required_stability, iterations_per_round, *args,
+            pool=self.pool, progress=job._on_event, **options
+        )
+        job.future = loop.run_in_executor(self.executor, run)
+        return job
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.owns_pool:
+            self.pool.close()
+            self.pool.join()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+
+async def _example():
+    async with JobRunner() as runner:
+        precise = runner.submit(roll_die, die_discriminator, iterations_per_round=100_000, chunk_size=10_000,
+                                precision=Precision(0.002))
+        rough = await precise.wait_until(lambda event: event.interval is not None and event.interval < 0.01)
+        print(f"Rough average die roll {rough.estimate:.3f} ± {rough.interval:.3f} after {rough.trials} trials")
+        average, _ = await precise
+        print(f"Precise average die roll {average:.4f} ± {precise.interval:.4f} after {precise.trials} trials")
+
+
+if __name__ == "__main__":
+    asyncio.run(_example())
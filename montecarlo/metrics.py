@@ -0,0 +1,93 @@
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from montecarlo.stats import RunningStats
+from montecarlo.stopping import Precision
+
+
+class Metrics:
+    discriminators: Dict[str, Callable[[Tuple[int | float, ...]], int | float]]
+
+    def __init__(self, discriminators: Dict[str, Callable[[Tuple[int | float, ...]], int | float]]):
+        self.discriminators = dict(discriminators)
+
+    @classmethod
+    def from_fields(cls, names: Sequence[str]) -> "Metrics":
+        return cls({name: itemgetter(index) for index, name in enumerate(names)})
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.discriminators)
+
+    def __call__(self, result: Tuple[int | float, ...]) -> Tuple[int | float, ...]:
+        return tuple(discriminator(result) for discriminator in self.discriminators.values())
+
+
+class MetricStats:
+    names: List[str]
+    metrics: Dict[str, RunningStats]
+
+    def __init__(self, names: Iterable[str]):
+        self.names = list(names)
+        self.metrics = {name: RunningStats() for name in self.names}
+
+    def push(self, values: Tuple[int | float, ...]):
+        for name, value in zip(self.names, values):
+            self.metrics[name].push(value)
+
+    def extend(self, values: Iterable[Tuple[int | float, ...]]):
+        for value in values:
+            self.push(value)
+
+    def merge(self, other: "MetricStats"):
+        for name in self.names:
+            self.metrics[name].merge(other.metrics[name])
+
+    def __getitem__(self, name: str) -> RunningStats:
+        return self.metrics[name]
+
+    @property
+    def count(self) -> int:
+        return self.metrics[self.names[0]].count if self.names else 0
+
+    @property
+    def mean(self) -> Dict[str, float]:
+        return {name: stats.mean for name, stats in self.metrics.items()}
+
+    @property
+    def variance(self) -> Dict[str, float]:
+        return {name: stats.variance for name, stats in self.metrics.items()}
+
+    def __repr__(self):
+        return f"MetricStats({self.metrics!r})"
+
+
+class MetricPrecision:
+    # Only the metrics given a target gate the run; every other metric is tracked for free alongside them.
+    targets: Dict[str, Precision]
+
+    def __init__(self, targets: Dict[str, Precision]):
+        if not targets:
+            raise ValueError("At least one metric needs a precision target")
+        self.targets = dict(targets)
+
+    @classmethod
+    def uniform(cls, precision: Precision, names: Iterable[str]) -> "MetricPrecision":
+        return cls({name: precision for name in names})
+
+    def interval(self, estimate: MetricStats) -> Dict[str, float]:
+        return {name: precision.interval(estimate[name]) for name, precision in self.targets.items()}
+
+    def satisfied(self, estimate: MetricStats) -> bool:
+        return all(precision.satisfied(estimate[name]) for name, precision in self.targets.items())
+
+    def trials_needed(self, estimate: MetricStats) -> int | float:
+        return max(precision.trials_needed(estimate[name]) for name, precision in self.targets.items())
+
+    def round_size(self, estimate: MetricStats, max_round: int) -> int:
+        unmet = [
+            precision.round_size(estimate[name], max_round)
+            for name, precision in self.targets.items()
+            if not precision.satisfied(estimate[name])
+        ]
+        return max(unmet, default=1)
@@ -0,0 +1,148 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+FunctionKey = Tuple[str, int, str]
+
+DETERMINISTIC = "deterministic"
+SAMPLING = "sampling"
+
+
+class WorkerProfile:
+    # pstats.Stats reads anything with create_stats() and a stats dict, so a worker ships this back instead
+    # of the unpicklable cProfile.Profile and the parent merges them with Stats.add.
+    stats: Dict[FunctionKey, Tuple[int, int, float, float, Dict[FunctionKey, Any]]]
+
+    def __init__(self, stats: Dict[FunctionKey, Tuple[int, int, float, float, Dict[FunctionKey, Any]]]):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class _Sampler(threading.Thread):
+    # Walks the profiled thread's stack every interval seconds, stopping at the frame that started
+    # profiling so that the worker's own plumbing is left out. The GIL makes the real gap between samples
+    # longer than the interval, so each sample is weighted by the time since the previous one.
+    def __init__(self, thread_id: int, boundary: Any, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.boundary = boundary
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.samples: Dict[FunctionKey, int] = {}
+        self.own: Dict[FunctionKey, float] = {}
+        self.inclusive: Dict[FunctionKey, float] = {}
+        self.callers: Dict[FunctionKey, Dict[FunctionKey, Tuple[int, float]]] = {}
+
+    def run(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            weight, last = now - last, now
+            stack = []
+            while frame is not None and frame is not self.boundary:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if not stack:
+                continue
+            self.own[stack[0]] = self.own.get(stack[0], 0.0) + weight
+            for key in set(stack):
+                self.samples[key] = self.samples.get(key, 0) + 1
+                self.inclusive[key] = self.inclusive.get(key, 0.0) + weight
+            for callee, caller in set(zip(stack, stack[1:])):
+                callers = self.callers.setdefault(callee, {})
+                count, seconds = callers.get(caller, (0, 0.0))
+                callers[caller] = (count + 1, seconds + weight)
+
+    def stats(self) -> Dict[FunctionKey, Tuple[int, int, float, float, Dict[FunctionKey, Any]]]:
+        # Expressed in pstats' (primitive calls, calls, own time, cumulative time, callers) layout, with
+        # sample counts standing in for call counts.
+        stats = {}
+        for key, samples in self.samples.items():
+            callers = {caller: (count, count, 0.0, seconds)
+                       for caller, (count, seconds) in self.callers.get(key, {}).items()}
+            stats[key] = (samples, samples, self.own.get(key, 0.0), self.inclusive[key], callers)
+        return stats
+
+
+def profile_call(mode: str, interval: float, func: Callable[..., Any], *args: Any) -> Tuple[Any, WorkerProfile]:
+    if mode == DETERMINISTIC:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(func, *args)
+        profiler.create_stats()
+        return result, WorkerProfile(profiler.stats)
+
+    sampler = _Sampler(threading.get_ident(), sys._getframe(), interval)
+    sampler.start()
+    try:
+        result = func(*args)
+    finally:
+        sampler.stopped.set()
+        sampler.join()
+    return result, WorkerProfile(sampler.stats())
+
+
+class Profile:
+    # Passed to the parallel engine as profile=, this profiles the first `trials` trials of the run wherever
+    # they are scheduled and merges every worker's share into one pstats.Stats. Chunks after the budget is
+    # spent run unprofiled. Deterministic mode uses cProfile and sees every call; sampling mode records
+    # the worker's stack every `interval` seconds, which costs far less on call-heavy code but reports
+    # sample counts rather than call counts.
+    mode: str
+    trials: int
+    interval: float
+    profiled_trials: int
+    seconds: float
+
+    def __init__(self, trials: int = 1000, mode: str = DETERMINISTIC, interval: float = 0.001):
+        if mode not in (DETERMINISTIC, SAMPLING):
+            raise ValueError(f"Profile mode must be {DETERMINISTIC!r} or {SAMPLING!r}, not {mode!r}")
+        self.mode = mode
+        self.trials = trials
+        self.interval = interval
+        self.profiled_trials = 0
+        self.seconds = 0.0
+        self._stats: Optional[pstats.Stats] = None
+
+    def claim(self, chunk_size: int) -> Optional[Tuple[str, float]]:
+        # Called by the engine as it lays out each chunk; returns the options to profile it with while any
+        # of the budget remains.
+        if self.profiled_trials >= self.trials:
+            return None
+        self.profiled_trials += chunk_size
+        return self.mode, self.interval
+
+    def merge(self, worker_profile: WorkerProfile, seconds: float = 0.0):
+        self.seconds += seconds
+        if self._stats is None:
+            self._stats = pstats.Stats(worker_profile)
+        else:
+            self._stats.add(worker_profile)
+
+    @property
+    def stats(self) -> Optional[pstats.Stats]:
+        return self._stats
+
+    def report(self, limit: int = 25, sort: str = "cumulative") -> str:
+        if self._stats is None:
+            return "No trials were profiled"
+        stream = io.StringIO()
+        self._stats.stream = stream
+        units = "samples" if self.mode == SAMPLING else "calls"
+        stream.write(f"{self.mode.capitalize()} profile of {self.profiled_trials} trials, "
+                     f"{self.seconds:.2f}s of worker time (ncalls are {units})\n")
+        self._stats.sort_stats(sort).print_stats(limit)
+        self._stats.stream = sys.stdout
+        return stream.getvalue()
+
+    def dump(self, path: str):
+        # Readable by pstats, snakeviz and friends.
+        if self._stats is not None:
+            self._stats.dump_stats(path)
@@ -0,0 +1,162 @@
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ChunkTiming:
+    worker: int
+    seconds: float
+    timed_out: int
+
+    def __init__(self, worker: int, seconds: float, timed_out: int = 0):
+        self.worker = worker
+        self.seconds = seconds
+        self.timed_out = timed_out
+
+
+class RoundEvent:
+    engine: str
+    round_number: int
+    trials: int
+    round_trials: int
+    elapsed: float
+    round_seconds: float
+    workers: int
+    compute_seconds: Optional[float]
+    ipc_seconds: Optional[float]
+    worker_utilisation: Dict[int, float]
+    estimate: float | Dict[str, float]
+    interval: Optional[float | Dict[str, float]]
+    stability: int
+    timed_out: int
+    finished: bool
+    details: Dict[str, Any]
+
+    def __init__(self, **fields: Any):
+        self.__dict__.update(fields)
+
+    @property
+    def trials_per_second(self) -> float:
+        return self.round_trials / self.round_seconds if self.round_seconds > 0 else 0.0
+
+    def __repr__(self):
+        return f"RoundEvent({self.__dict__!r})"
+
+
+class Progress:
+    # Every method returns straight away when no hook is attached, so an uninstrumented run only pays for
+    # the attribute check. Engines add the trials they dropped for running out of budget to timed_out.
+    engine: str
+    hook: Optional[Callable[[RoundEvent], None]]
+    workers: int
+    round_number: int
+    timed_out: int
+
+    def __init__(self, engine: str, hook: Optional[Callable[[RoundEvent], None]], workers: int = 1):
+        self.engine = engine
+        self.hook = hook
+        self.workers = workers
+        self.round_number = 0
+        self.timed_out = 0
+        self.started = self.round_started = time.perf_counter() if hook else 0.0
+
+    def start_round(self):
+        if self.hook:
+            self.round_started = time.perf_counter()
+
+    def end_round(self, estimate: Any, round_trials: int, interval: Optional[float | Dict[str, float]] = None,
+                  stability: int = 0, timings: Optional[Iterable[ChunkTiming]] = None, **details: Any):
+        self.round_number += 1
+        if not self.hook:
+            return
+        now = time.perf_counter()
+        round_seconds = now - self.round_started
+
+        # Serial engines pass no timings and spend the whole round computing in this process; the parallel
+        # engine passes one ChunkTiming per chunk, and anything left of workers * wall time was spent on
+        # dispatch, pickling and waiting.
+        if timings is None:
+            compute_seconds = round_seconds
+            utilisation = {os.getpid(): 1.0}
+        else:
+            busy: Dict[int, float] = {}
+            for timing in timings:
+                busy[timing.worker] = busy.get(timing.worker, 0.0) + timing.seconds
+            compute_seconds = sum(busy.values()) if busy else None
+            utilisation = {worker: seconds / round_seconds for worker, seconds in busy.items()} if round_seconds else {}
+        ipc_seconds = None
+        if compute_seconds is not None:
+            ipc_seconds = max(0.0, round_seconds * (self.workers if timings is not None else 1) - compute_seconds)
+
+        self.hook(RoundEvent(
+            engine=self.engine,
+            round_number=self.round_number,
+            trials=estimate.count,
+            round_trials=round_trials,
+            elapsed=now - self.started,
+            round_seconds=round_seconds,
+            workers=self.workers,
+            compute_seconds=compute_seconds,
+            ipc_seconds=ipc_seconds,
+            worker_utilisation=utilisation,
+            estimate=estimate.mean,
+            interval=interval,
+            stability=stability,
+            timed_out=self.timed_out,
+            finished=False,
+            details=details,
+        ))
+
+    def finish(self, estimate: Any, interval: Optional[float | Dict[str, float]] = None, stability: int = 0,
+               **details: Any):
+        if not self.hook:
+            return
+        now = time.perf_counter()
+        self.hook(RoundEvent(
+            engine=self.engine,
+            round_number=self.round_number,
+            trials=estimate.count,
+            round_trials=0,
+            elapsed=now - self.started,
+            round_seconds=0.0,
+            workers=self.workers,
+            compute_seconds=None,
+            ipc_seconds=None,
+            worker_utilisation={},
+            estimate=estimate.mean,
+            interval=interval,
+            stability=stability,
+            timed_out=self.timed_out,
+            finished=True,
+            details=details,
+        ))
+
+
+def format_value(value: float | Dict[str, float], places: int = 4) -> str:
+    if isinstance(value, dict):
+        return ", ".join(f"{name} {item:.{places}f}" for name, item in value.items())
+    return f"{value:.{places}f}"
+
+
+def print_progress(event: RoundEvent):
+    if event.finished:
+        extras = "".join(f", {key} {value}" for key, value in event.details.items())
+        if event.timed_out:
+            extras += f", {event.timed_out} timed out"
+        print(f"[{event.engine}] finished after {event.trials} trials in {event.elapsed:.2f}s: "
+              f"{format_value(event.estimate)}{extras}")
+        return
+
+    line = (f"[{event.engine}] round {event.round_number}: {event.trials} trials, "
+            f"{event.trials_per_second:.0f} trials/s, estimate {format_value(event.estimate)}")
+    if event.interval is not None:
+        line += f" ± {format_value(event.interval)}"
+    else:
+        line += f", stability {event.stability}"
+    if event.timed_out:
+        line += f", {event.timed_out} timed out"
+    if event.compute_seconds is not None and event.ipc_seconds is not None:
+        total = event.compute_seconds + event.ipc_seconds
+        if total > 0:
+            line += f", {event.compute_seconds / total:.0%} computing"
+    print(line)
@@ -0,0 +1,182 @@
+import math
+from random import Random, getrandbits
+from statistics import NormalDist
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from blackjack.game import CautiousPlayer, Player, RandomPlayer, StrategicPlayer, play_blackjack
+from montecarlo.executors import make_executor
+from montecarlo.progress import Progress, RoundEvent, print_progress
+from montecarlo.rng import derive_seed
+from montecarlo.sim import pool_size, run_chunk, split_round
+from montecarlo.stats import RunningStats
+from montecarlo.stopping import Precision
+
+
+class RaceResult:
+    name: str
+    estimate: RunningStats
+    z: float
+    eliminated_at: Optional[int]
+
+    def __init__(self, name: str, z: float):
+        self.name = name
+        self.estimate = RunningStats()
+        self.z = z
+        self.eliminated_at = None
+
+    @property
+    def mean(self) -> float:
+        return self.estimate.mean
+
+    @property
+    def trials(self) -> int:
+        return self.estimate.count
+
+    @property
+    def half_width(self) -> float:
+        if self.estimate.count < 2:
+            return math.inf
+        return self.z * self.estimate.std / math.sqrt(self.estimate.count)
+
+    @property
+    def lower(self) -> float:
+        return self.mean - self.half_width
+
+    @property
+    def upper(self) -> float:
+        return self.mean + self.half_width
+
+    def __repr__(self):
+        status = f", eliminated in round {self.eliminated_at}" if self.eliminated_at is not None else ""
+        return f"RaceResult({self.name}: {self.mean:.4f} [{self.lower:.4f}, {self.upper:.4f}] over {self.trials} trials{status})"
+
+
+def race(
+        candidates: Dict[str, Tuple[Callable[..., Tuple[int | float, ...]], Tuple[Any, ...]]],
+        discriminator: Callable[[Tuple[int | float]], int | float],
+        confidence_level: float = 0.95,
+        maximise: bool = True,
+        batch_size: int = 1000,
+        chunk_size: int = 100,
+        min_trials: int = 100,
+        precision: Optional[Precision] = None,
+        max_trials: Optional[int] = None,
+        seed: Optional[int] = None,
+        progress: Optional[Callable[[RoundEvent], None]] = None,
+        pool: Optional[Any] = None
+) -> List[RaceResult]:
+    # Every candidate still in contention gets another batch each round. Intervals are Bonferroni corrected
+    # across the field and, given max_trials, across every round that can eliminate, so that confidence_level
+    # holds for the whole race. With only a precision the number of rounds is not known in advance, and the
+    # level holds for each round's look on its own. A candidate is dropped once its interval lies wholly on
+    # the wrong side of the best candidate's. The race ends with one survivor, when every survivor meets precision (a tie at that
+    # resolution), or when every survivor has max_trials. A pool passed in is left running for the caller;
+    # otherwise one is made (or the named executor) and shut down when the race ends.
+    if precision is None and max_trials is None:
+        raise ValueError("A race needs a precision or max_trials so that tied candidates still finish")
+
+    looks = 1
+    if max_trials:
+        looks = max(1, math.ceil(max_trials / batch_size) - math.ceil(min_trials / batch_size) + 1)
+    z = NormalDist().inv_cdf(1 - (1 - confidence_level) / (2 * len(candidates) * looks))
+    entrants = [RaceResult(name, z) for name in candidates]
+    specs = list(candidates.values())
+    chunks = split_round(batch_size, chunk_size)
+    round_number = 0
+    owns_pool = pool is None or isinstance(pool, str)
+    pool = make_executor(pool or "process") if owns_pool else pool
+    tracker = Progress("race", progress, pool_size(pool))
+
+    try:
+        while True:
+            running = [index for index, entrant in enumerate(entrants) if entrant.eliminated_at is None]
+            jobs = []
+            tracker.start_round()
+            for index in running:
+                func, args = specs[index]
+                for chunk_index, size in enumerate(chunks):
+                    chunk_seed = derive_seed(seed, round_number, index, chunk_index) if seed is not None else None
+                    jobs.append((index, (func, discriminator, size, args, None, chunk_seed)))
+            timings = []
+            chunk_results = pool.starmap(run_chunk, (job for _, job in jobs))
+            for (index, _), (chunk_estimate, _, timing, _) in zip(jobs, chunk_results):
+                entrants[index].estimate.merge(chunk_estimate)
+                timings.append(timing)
+            round_number += 1
+
+            contenders = [entrants[index] for index in running]
+            if all(entrant.trials >= min_trials for entrant in contenders):
+                if maximise:
+                    best_lower = max(entrant.lower for entrant in contenders)
+                    beaten = [entrant for entrant in contenders if entrant.upper < best_lower]
+                else:
+                    best_upper = min(entrant.upper for entrant in contenders)
+                    beaten = [entrant for entrant in contenders if entrant.lower > best_upper]
+                for entrant in beaten:
+                    entrant.eliminated_at = round_number
+            else:
+                beaten = []
+
+            tracker.end_round(
+                _RaceView(contenders), batch_size * len(contenders),
+                {entrant.name: entrant.half_width for entrant in contenders},
+                timings=timings, eliminated=[entrant.name for entrant in beaten],
+            )
+            contenders = [entrant for entrant in contenders if entrant.eliminated_at is None]
+
+            if len(contenders) == 1:
+                break
+            if precision and all(precision.satisfied(entrant.estimate) for entrant in contenders):
+                break
+            if max_trials and all(entrant.trials >= max_trials for entrant in contenders):
+                break
+    finally:
+        if owns_pool:
+            pool.close()
+            pool.join()
+
+    ranking = sorted(entrants, key=lambda entrant: entrant.mean, reverse=maximise)
+    tracker.finish(_RaceView(entrants), {entrant.name: entrant.half_width for entrant in entrants},
+                   winner=ranking[0].name)
+    return ranking
+
+
+class _RaceView:
+    # Presents a field of entrants to Progress the way an engine's estimate would.
+    def __init__(self, entrants: List[RaceResult]):
+        self.entrants = entrants
+
+    @property
+    def count(self) -> int:
+        return sum(entrant.trials for entrant in self.entrants)
+
+    @property
+    def mean(self) -> Dict[str, float]:
+        return {entrant.name: entrant.mean for entrant in self.entrants}
+
+
+def blackjack_session(player_class: Type[Player], rounds: int = 10) -> Tuple[float]:
+    rng = Random(getrandbits(64))
+    return play_blackjack(rng, player_class(rng), rounds),
+
+
+def winnings(result: Tuple[float]) -> float:
+    value, = result
+    return value
+
+
+if __name__ == "__main__":
+    ranking = race(
+        {
+            "Cautious": (blackjack_session, (CautiousPlayer,)),
+            "Strategic": (blackjack_session, (StrategicPlayer,)),
+            "Random": (blackjack_session, (RandomPlayer,)),
+            "Stand": (blackjack_session, (Player,)),
+        },
+        winnings,
+        precision=Precision(0.05),
+        seed=0,
+        progress=print_progress,
+    )
+    for position, entrant in enumerate(ranking, 1):
+        print(f"{position}. {entrant}")
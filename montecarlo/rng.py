@@ -0,0 +1,15 @@
+import hashlib
+import random
+from typing import Optional
+
+
+def derive_seed(seed: int, *path: int) -> int:
+    # Hashing the (master seed, round, chunk...) path gives every chunk its own 256 bit Mersenne Twister seed,
+    # independent of which worker ends up running it.
+    key = ":".join(str(part) for part in (seed, *path)).encode()
+    return int.from_bytes(hashlib.sha256(key).digest(), "little")
+
+
+def seed_global(seed: Optional[int]):
+    if seed is not None:
+        random.seed(seed)
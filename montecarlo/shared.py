@@ -0,0 +1,231 @@
+import mmap
+import os
+import shutil
+import tempfile
+import weakref
+from array import array
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from montecarlo.columns import NPY_DESCR
+
+# tmpfs, where there is one, so the segments are plain shared memory. They are files rather than
+# multiprocessing.shared_memory blocks because, before Python 3.13, every process that attaches to one of
+# those registers it with its own resource tracker, which unlinks it when that worker exits.
+SHARED_MEMORY_DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+def _attach(path: str) -> mmap.mmap:
+    with open(path, "r+b") as f:
+        return mmap.mmap(f.fileno(), 0)
+
+
+def _converter(typecode: str) -> Callable[[Any], int | float]:
+    return float if typecode in "fd" else int
+
+
+class SlotWriter:
+    # The worker's end of a SharedSlot: maps the parent's segment and writes each record straight into its
+    # reserved rows. A worker that cannot see the parent's shared memory (a remote Coordinator node) keeps
+    # the rows in arrays instead and they travel back with the chunk.
+    segment: List[str]
+    typecodes: str
+    start: int
+    rows: int
+    written: int
+    buffer: Optional[List[array]]
+
+    def __init__(self, segment: List[str], typecodes: str, start: int, rows: int):
+        self.segment = segment
+        self.typecodes = typecodes
+        self.start = start
+        self.rows = rows
+        self.written = 0
+        self.buffer = None
+        self._converters = [_converter(typecode) for typecode in typecodes]
+        self._memory: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+        try:
+            self._memory = [_attach(path) for path in segment]
+        except FileNotFoundError:
+            self.buffer = [array(typecode) for typecode in typecodes]
+            return
+        for memory, typecode in zip(self._memory, typecodes):
+            itemsize = array(typecode).itemsize
+            self._views.append(memoryview(memory)[start * itemsize:(start + rows) * itemsize].cast(typecode))
+
+    def push(self, result: Tuple[int | float, ...]):
+        if self.written >= self.rows:
+            raise IndexError(f"Slot of {self.rows} rows is full")
+        if self.buffer is not None:
+            for column, value in zip(self.buffer, result):
+                column.append(value)
+        else:
+            row = self.written
+            for view, convert, value in zip(self._views, self._converters, result):
+                view[row] = convert(value)
+        self.written += 1
+
+    def detach(self):
+        for view in self._views:
+            view.release()
+        for memory in self._memory:
+            memory.close()
+        self._views = []
+        self._memory = []
+
+    def __getstate__(self):
+        self.detach()
+        state = self.__dict__.copy()
+        del state["_converters"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._converters = [_converter(typecode) for typecode in self.typecodes]
+
+
+class SharedSlot:
+    # A block of rows reserved by the parent for one chunk, passed to run_chunk as its sink factory.
+    def __init__(self, segment: List[str], typecodes: str, start: int, rows: int):
+        self.segment = segment
+        self.typecodes = typecodes
+        self.start = start
+        self.rows = rows
+
+    def __call__(self) -> SlotWriter:
+        return SlotWriter(self.segment, self.typecodes, self.start, self.rows)
+
+
+class SharedColumns:
+    # Per-trial records in shared memory, one column per field. The parent reserves a slot of rows for each
+    # chunk before dispatching it, workers write into the slot in place, and merging a finished chunk only
+    # counts its rows, so collecting a run pickles no records and the parent's heap does not grow with it.
+    # Columns live in fixed size segments; reading a column that spans several copies it into one array,
+    # while segments() gives the zero-copy views. The memory is released by close() or on leaving a with
+    # block, and the store cannot outlive the process that made it.
+    typecodes: str
+    names: List[str]
+    segment_rows: int
+
+    def __init__(self, typecodes: str, names: Optional[Sequence[str]] = None, segment_rows: int = 1 << 20):
+        unsupported = set(typecodes) - set(NPY_DESCR)
+        if unsupported:
+            raise ValueError(f"Unsupported column typecodes {''.join(sorted(unsupported))}")
+        if names is not None and len(names) != len(typecodes):
+            raise ValueError("typecodes and names must have the same length")
+        self.typecodes = typecodes
+        self.names = list(names) if names is not None else [f"field_{index}" for index in range(len(typecodes))]
+        self.segment_rows = segment_rows
+        self.directory = tempfile.mkdtemp(prefix="montecarlo-shared-", dir=SHARED_MEMORY_DIRECTORY)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+        self._segments: List[List[mmap.mmap]] = []
+        self._paths: List[List[str]] = []
+        self._capacity: List[int] = []
+        self._reserved: List[int] = []
+        self._committed = 0
+        self._parent: Optional[SlotWriter] = None
+
+    def _new_segment(self, rows: int):
+        paths = [os.path.join(self.directory, f"{len(self._segments)}-{name}") for name in self.names]
+        for path, typecode in zip(paths, self.typecodes):
+            with open(path, "xb") as f:
+                f.truncate(max(1, rows * array(typecode).itemsize))
+        self._paths.append(paths)
+        self._segments.append([_attach(path) for path in paths])
+        self._capacity.append(rows)
+        self._reserved.append(0)
+
+    def reserve(self, rows: int) -> SharedSlot:
+        self._settle()
+        if not self._segments or self._capacity[-1] - self._reserved[-1] < rows:
+            self._new_segment(max(rows, self.segment_rows))
+        start = self._reserved[-1]
+        self._reserved[-1] += rows
+        return SharedSlot(self._paths[-1], self.typecodes, start, rows)
+
+    def merge(self, writer: SlotWriter):
+        if writer.written != writer.rows:
+            raise ValueError(f"Chunk wrote {writer.written} of its {writer.rows} reserved rows")
+        writer.detach()
+        if writer.buffer is not None:
+            local = SlotWriter(writer.segment, writer.typecodes, writer.start, writer.rows)
+            for row in zip(*writer.buffer):
+                local.push(row)
+            local.detach()
+        self._committed += writer.rows
+
+    def push(self, result: Tuple[int | float, ...]):
+        # Records produced in the parent (serial engines, unchunked runs) go through a parent-side slot.
+        if self._parent is not None and self._parent.written == self._parent.rows:
+            self._settle()
+        if self._parent is None:
+            slot = self.reserve(min(self.segment_rows, 4096))
+            self._parent = slot()
+        self._parent.push(result)
+
+    def _settle(self):
+        # A partly filled parent-side slot gives back its unused rows so the segment stays contiguous.
+        if self._parent is None:
+            return
+        self._parent.detach()
+        self._committed += self._parent.written
+        if self._reserved[-1] == self._parent.start + self._parent.rows:
+            self._reserved[-1] = self._parent.start + self._parent.written
+        self._parent = None
+
+    def __len__(self):
+        return self._committed + (self._parent.written if self._parent is not None else 0)
+
+    def segments(self, index: int | str) -> List[memoryview]:
+        if isinstance(index, str):
+            index = self.names.index(index)
+        self._settle()
+        typecode = self.typecodes[index]
+        itemsize = array(typecode).itemsize
+        return [memoryview(memories[index])[:rows * itemsize].cast(typecode)
+                for memories, rows in zip(self._segments, self._reserved)]
+
+    def column(self, index: int | str) -> Sequence[int | float]:
+        views = self.segments(index)
+        if len(views) == 1:
+            return views[0]
+        column = array(self.typecodes[index if isinstance(index, int) else self.names.index(index)])
+        for view in views:
+            column.frombytes(view.tobytes())
+        return column
+
+    def as_dict(self):
+        return {name: self.column(index) for index, name in enumerate(self.names)}
+
+    def rows(self) -> Iterator[Tuple[int | float, ...]]:
+        return zip(*(self.column(index) for index in range(len(self.typecodes))))
+
+    def close(self):
+        if self._parent is not None:
+            self._parent.detach()
+            self._parent = None
+        for memories in self._segments:
+            for memory in memories:
+                try:
+                    memory.close()
+                except BufferError:
+                    # A column view is still held; the mapping goes when it does, the files go now.
+                    pass
+        self._finalizer()
+        self._segments = []
+        self._paths = []
+        self._capacity = []
+        self._reserved = []
+        self._committed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        raise TypeError("SharedColumns belong to the process that created them and cannot be pickled")
+
+    def __repr__(self):
+        return f"SharedColumns({len(self)} rows, typecodes={self.typecodes!r}, segments={len(self._segments)})"
@@ -1,9 +1,229 @@
-from multiprocessing import Pool
-from random import Random, randint
-from typing import Callable, Any, Tuple, Dict, Iterable, List
+import os
+import sys
+import time
+from functools import partial
+from random import Random, randint, getrandbits
+from typing import Callable, Any, Tuple, Dict, Iterable, Iterator, List, Optional
 from math import log10, floor
 
 from blackjack.game import play_blackjack, StrategicPlayer, CautiousPlayer
+from montecarlo.budget import TrialBudget, TrialTimeout
+from montecarlo.cache import ResultCache
+from montecarlo.columns import ColumnStore
+from montecarlo.distributions import Distributions
+from montecarlo.exemplars import Exemplars, takes_keyword
+from montecarlo.executors import make_executor
+from montecarlo.checkpoint import Checkpoint, load_checkpoint, save_checkpoint
+from montecarlo.rng import derive_seed, seed_global
+from montecarlo.shared import SharedColumns
+from montecarlo.stats import ResultStats, RunningStats
+from montecarlo.metrics import MetricPrecision, Metrics, MetricStats
+from montecarlo.profiling import Profile, WorkerProfile, profile_call
+from montecarlo.progress import ChunkTiming, Progress, RoundEvent, print_progress
+from montecarlo.stopping import Precision
+from montecarlo.tuning import AutoTune
+from montecarlo.variance import (AntitheticRandom, AntitheticStats, ControlVariate, ControlVariateStats, ImportanceStats,
+                                 Strata, StratifiedStats)
+
+Store = ColumnStore | SharedColumns | Distributions
+Results = List[Tuple[float | int, ...]] | ResultStats | Store
+Estimate = RunningStats | ControlVariateStats | AntitheticStats | ImportanceStats | StratifiedStats | MetricStats
+Stopping = Precision | MetricPrecision
+Mean = float | Dict[str, float]
+
+
+def new_results(streaming: bool = False, store: Optional[Store] = None) -> Results:
+    if store is not None:
+        return store
+    return ResultStats() if streaming else []
+
+
+ProgressHook = Callable[[RoundEvent], None]
+
+
+def results_recorder(results: Results) -> Callable[[Tuple[float | int, ...]], None]:
+    return results.append if isinstance(results, list) else results.push
+
+
+def check_estimator(
+        discriminator: Callable[[Tuple[int | float]], int | float] | Metrics,
+        precision: Optional[Stopping],
+        control: Optional[ControlVariate],
+        antithetic: bool,
+        proposal: Optional[Any] = None,
+        strata: Optional[Strata] = None
+):
+    techniques = [bool(control), antithetic, proposal is not None, strata is not None]
+    if sum(techniques) > 1:
+        raise ValueError("Only one of control variates, antithetic pairs, importance sampling and stratification "
+                         "can be used at a time")
+    if isinstance(discriminator, Metrics):
+        if any(techniques):
+            raise ValueError("Variance reduction works on a single discriminator, not Metrics")
+        if not isinstance(precision, MetricPrecision):
+            raise ValueError("Metrics need a MetricPrecision stopping rule")
+    elif isinstance(precision, MetricPrecision):
+        raise ValueError("MetricPrecision needs the discriminator to be Metrics")
+
+
+def check_exemplars(exemplars: Optional[Exemplars], func: Callable[..., Any], antithetic: bool,
+                    proposal: Optional[Any]):
+    # A replay only sees the trial's seed and keyword arguments, not the antithetic generator or tilted dice.
+    if exemplars is None:
+        return
+    if antithetic or proposal is not None:
+        raise ValueError("Exemplars cannot be replayed from antithetic pairs or under a proposal")
+    if exemplars.detail is not None and not takes_keyword(func, exemplars.detail):
+        raise ValueError(f"Exemplars replay trials with a {exemplars.detail} keyword argument, which "
+                         f"{getattr(func, '__name__', func)} does not take; pass detail=None to keep results only")
+
+
+def estimator_config(
+        estimate: Estimate,
+        discriminator: Callable[[Tuple[int | float]], int | float] | Metrics,
+        control: Optional[ControlVariate],
+        antithetic: bool,
+        proposal: Optional[Any],
+        strata: Optional[Strata]
+) -> Dict[str, Any]:
+    # What a checkpointed estimate was built for. Trials only merge into an estimate of the same kind, kept
+    # with the same control, proposal, strata or metrics.
+    return {
+        "estimate": type(estimate).__name__,
+        "metrics": discriminator.names if isinstance(discriminator, Metrics) else None,
+        "control": (getattr(control.func, "__qualname__", repr(control.func)), control.mean) if control else None,
+        "antithetic": antithetic,
+        "proposal": (type(proposal).__qualname__, tuple(getattr(proposal, "probabilities", ())))
+        if proposal is not None else None,
+        "strata": list(strata.probabilities) if strata is not None else None,
+    }
+
+
+def estimate_details(estimate: Estimate, timed_out: int = 0) -> Dict[str, Any]:
+    # Trials that time out are left out, so the estimate is then only of the trials that finished in time,
+    # which is biased whenever the slow trials differ, and is flagged as conditional.
+    details: Dict[str, Any] = {}
+    if isinstance(estimate, ImportanceStats):
+        details = {"variance_reduction": estimate.variance_reduction,
+                   "effective_sample_size": estimate.effective_sample_size}
+    elif isinstance(estimate, (ControlVariateStats, AntitheticStats, StratifiedStats)):
+        details = {"variance_reduction": estimate.variance_reduction}
+    if timed_out:
+        details["conditional_on_finishing"] = True
+    return details
+
+
+def new_estimate(
+        discriminator: Callable[[Tuple[int | float]], int | float] | Metrics,
+        control: Optional[ControlVariate] = None,
+        antithetic: bool = False,
+        proposal: Optional[Any] = None,
+        strata: Optional[Strata] = None
+) -> Estimate:
+    # A Metrics discriminator returns one value per named metric, each tracked in its own RunningStats.
+    if isinstance(discriminator, Metrics):
+        return MetricStats(discriminator.names)
+    if control:
+        return ControlVariateStats(control.mean)
+    if antithetic:
+        return AntitheticStats()
+    if proposal is not None:
+        return ImportanceStats()
+    if strata is not None:
+        return StratifiedStats(strata.probabilities)
+    return RunningStats()
+
+
+def run_block(
+        func: Callable[..., Tuple[int | float, ...]],
+        args: Iterable[Any],
+        kwargs: Dict[str, Any],
+        discriminator: Callable[[Tuple[int | float]], int | float],
+        trials: int,
+        estimate: Estimate,
+        record: Optional[Callable[[Tuple[int | float, ...]], None]] = None,
+        control: Optional[ControlVariate] = None,
+        antithetic: bool = False,
+        proposal: Optional[Any] = None,
+        strata: Optional[Strata] = None,
+        budget: Optional[TrialBudget] = None,
+        exemplars: Optional[Exemplars] = None
+) -> int:
+    # In antithetic mode each trial is a pair of calls, func(..., rng=Random(s)) and func(..., rng=AntitheticRandom(s)),
+    # and the estimate counts pairs.
+    # A proposal (such as tonk.dice.TiltedD6) is entered around the block, begun before each trial and asked for
+    # the trial's likelihood ratio after it. With strata each trial is called as func(..., stratum=index).
+    # A trial that raises TrialTimeout, or overruns the budget, is left out of the estimate and the results;
+    # returns how many were. With exemplars every trial is offered to its reservoirs.
+    if budget is not None:
+        func = partial(budget.call, func)
+    if exemplars is not None:
+        func = partial(exemplars.call, func)
+    timed_out = 0
+    if proposal is not None:
+        with proposal:
+            for _ in range(trials):
+                proposal.begin()
+                try:
+                    result = func(*args, **kwargs)
+                except TrialTimeout:
+                    timed_out += 1
+                    continue
+                if record:
+                    record(result)
+                estimate.push(discriminator(result), proposal.weight())
+    elif strata is not None:
+        for stratum, count in enumerate(strata.split(trials)):
+            for _ in range(count):
+                try:
+                    result = func(*args, stratum=stratum, **kwargs)
+                except TrialTimeout:
+                    timed_out += 1
+                    continue
+                if record:
+                    record(result)
+                estimate.push(stratum, discriminator(result))
+    elif antithetic:
+        for _ in range(trials):
+            seed = getrandbits(64)
+            try:
+                result = func(*args, rng=Random(seed), **kwargs)
+                antithetic_result = func(*args, rng=AntitheticRandom(seed), **kwargs)
+            except TrialTimeout:
+                timed_out += 1
+                continue
+            if record:
+                record(result)
+                record(antithetic_result)
+            estimate.push_pair(discriminator(result), discriminator(antithetic_result))
+    elif control:
+        for _ in range(trials):
+            try:
+                result = func(*args, **kwargs)
+            except TrialTimeout:
+                timed_out += 1
+                continue
+            if record:
+                record(result)
+            estimate.push(discriminator(result), control.func(result))
+    elif record:
+        for _ in range(trials):
+            try:
+                result = func(*args, **kwargs)
+            except TrialTimeout:
+                timed_out += 1
+                continue
+            record(result)
+            estimate.push(discriminator(result))
+    else:
+        for _ in range(trials):
+            try:
+                result = func(*args, **kwargs)
+            except TrialTimeout:
+                timed_out += 1
+                continue
+            estimate.push(discriminator(result))
+    return timed_out
 
 
 def calculate_confidence_(val_a: float, val_b: float) -> int:
@@ -11,41 +231,124 @@ def calculate_confidence_(val_a: float, val_b: float) -> int:
     return floor(-log10(difference))
 
 
-def simulate(func: Callable[..., Tuple[float, ...]], args: Any, kwargs: Any,
-             discriminator: Callable[[Tuple[float, ...]], float], confidence: int = 4, required_stability: int = 10,
-             step: int = 1000) -> Tuple[float, List[Tuple[float, ...]]]:
-    statistics = []
-    confidence_test: float = 0
-    n = 0
-    stability = 0
-
+def converge(
+        run_round: Callable[[int, int], Optional[List[ChunkTiming]]],
+        estimate: Estimate,
+        tracker: Progress,
+        required_confidence: int,
+        required_stability: int,
+        iterations_per_round: int,
+        precision: Optional[Stopping] = None,
+        stability: int = 0,
+        round_number: int = 0,
+        after_round: Optional[Callable[[int, int], None]] = None,
+        tune: Optional[AutoTune] = None,
+        workers: int = 1
+) -> Tuple[int, int]:
+    # The stopping logic every engine shares: run_round(round_size, round_number) adds a round of trials to
+    # estimate however it likes (in process, or on any executor) and returns its chunk timings, if it has any.
+    # Runs until precision is met, or without one until the mean has held to required_confidence decimal
+    # places for required_stability rounds in a row. Returns the final stability and round number.
+    # With a tune each round is at most what it plans for the workers, rather than iterations_per_round.
     while stability < required_stability:
-        old_confidence_test = confidence_test / n if n > 0 else 0
-        for _ in range(step):
-            n += 1
-            result = func(*args, **kwargs)
-            statistics.append(result)
-            confidence_test += discriminator(result)
-        new_confidence_test = confidence_test / n
-
-        calculated_confidence = calculate_confidence(old_confidence_test, new_confidence_test)
-
-        iteration = n // step
-
-        if calculated_confidence >= confidence:
-            stability += 1
-            print(f"Stability {stability} at iteration {iteration}")
+        if precision and precision.satisfied(estimate):
+            break
+        previous_mean = estimate.mean
+        iterations = estimate.count
+        most = tune.round_trials(workers) if tune is not None else iterations_per_round
+        round_size = precision.round_size(estimate, most) if precision else most
+        tracker.start_round()
+        timings = run_round(round_size, round_number)
+        round_number += 1
+
+        if precision:
+            tracker.end_round(estimate, round_size, precision.interval(estimate), timings=timings,
+                              trials_needed=precision.trials_needed(estimate))
         else:
-            deviation = round(abs(old_confidence_test - new_confidence_test), confidence)
-            if stability:
-                print(f"Stability lost at iteration {iteration} - {deviation} deviation")
+            if iterations:
+                confidence = calculate_confidence(previous_mean, estimate.mean)
+            else:
+                confidence = 0
+
+            if confidence >= required_confidence:
+                stability += 1
             else:
-                print(f"Current confidence at {calculated_confidence} at iteration {iteration} - {deviation} deviation")
-            stability = 0
+                stability = 0
+            tracker.end_round(estimate, round_size, stability=stability, timings=timings, confidence=confidence)
 
-    return new_confidence_test, statistics
+        if after_round:
+            after_round(stability, round_number)
+    return stability, round_number
 
 
+def simulate(func: Callable[..., Tuple[float, ...]], args: Any, kwargs: Any,
+             discriminator: Callable[[Tuple[float, ...]], float], confidence: int = 4, required_stability: int = 10,
+             step: int = 1000, streaming: bool = False, store: Optional[Store] = None,
+             precision: Optional[Stopping] = None, seed: Optional[int] = None,
+             control: Optional[ControlVariate] = None, antithetic: bool = False,
+             progress: Optional[ProgressHook] = None, proposal: Optional[Any] = None,
+             strata: Optional[Strata] = None, trial_timeout: Optional[float] = None,
+             tune: Optional[AutoTune] = None, exemplars: Optional[Exemplars] = None) -> Tuple[Mean, Results]:
+    return _serial("simulate", func, args, kwargs, discriminator, confidence, required_stability, step, streaming,
+                   store, precision, seed, control, antithetic, progress, proposal, strata, trial_timeout, tune,
+                   exemplars)
+
+
+def _serial(
+        engine: str,
+        func: Callable[..., Tuple[int | float, ...]],
+        args: Iterable[Any],
+        kwargs: Dict[str, Any],
+        discriminator: Callable[[Tuple[int | float]], int | float],
+        required_confidence: int,
+        required_stability: int,
+        iterations_per_round: int,
+        streaming: bool,
+        store: Optional[Store],
+        precision: Optional[Stopping],
+        seed: Optional[int],
+        control: Optional[ControlVariate],
+        antithetic: bool,
+        progress: Optional[ProgressHook],
+        proposal: Optional[Any],
+        strata: Optional[Strata],
+        trial_timeout: Optional[float],
+        tune: Optional[AutoTune],
+        exemplars: Optional[Exemplars]
+) -> Tuple[Mean, Results]:
+    # Trials run in this process, straight into the caller's results, with one seed for the whole run.
+    # With a tune each round is sized to take tune.round_seconds, in place of iterations_per_round.
+    # Exemplars are filled in place and their trials replayed for logs once the run has converged.
+    check_estimator(discriminator, precision, control, antithetic, proposal, strata)
+    check_exemplars(exemplars, func, antithetic, proposal)
+    budget = TrialBudget(trial_timeout) if trial_timeout else None
+    seed_global(seed)
+    results = new_results(streaming, store)
+    record = results_recorder(results)
+    estimate = new_estimate(discriminator, control, antithetic, proposal, strata)
+    tracker = Progress(engine, progress)
+
+    def run_round(round_size: int, round_number: int) -> None:
+        if strata is not None:
+            strata.update(estimate)
+        started = time.perf_counter()
+        timed_out = run_block(func, args, kwargs, discriminator, round_size, estimate, record, control, antithetic,
+                              proposal, strata, budget, exemplars)
+        if tune is not None:
+            seconds = time.perf_counter() - started
+            tune.observe(round_size, seconds, seconds)
+        tracker.timed_out += timed_out
+        if timed_out == round_size:
+            raise RuntimeError(f"Every trial in round {round_number} timed out")
+
+    stability, _ = converge(run_round, estimate, tracker, required_confidence, required_stability,
+                            iterations_per_round, precision, tune=tune)
+    if exemplars is not None:
+        exemplars.replay(func, args, kwargs)
+    tracker.finish(estimate, precision.interval(estimate) if precision else None, stability,
+                   **estimate_details(estimate, tracker.timed_out))
+
+    return estimate.mean, results
 
 
 def monte_carlo(
@@ -63,21 +366,26 @@ def monte_carlo_improved(
         func: Callable[..., Tuple[int | float, ...]],
         discriminator: Callable[[Tuple[int | float]], int | float],
         iterations: int,
-        *args: Any, **kwargs: Any
-) -> Tuple[float, List[Tuple[float | int, ...]]]:
+        *args: Any, streaming: bool = False, store: Optional[Store] = None, seed: Optional[int] = None,
+        **kwargs: Any
+) -> Tuple[float, Results]:
+    seed_global(seed)
     accumulator = 0
-    results = []
+    results = new_results(streaming, store)
+    record = results_recorder(results)
 
     for _ in range(iterations):
         result = func(*args, **kwargs)
         accumulator += discriminator(result)
-        results.append(result)
+        record(result)
 
     return accumulator / iterations, results
 
 
 def calculate_confidence(val_a: float, val_b: float) -> int:
     difference = abs(val_a - val_b)
+    if difference == 0:
+        return sys.maxsize
     return floor(-log10(difference))
 
 
@@ -87,39 +395,83 @@ def monte_carlo_self_stabalising(
         required_confidence: int = 3,
         required_stability: int = 10,
         iterations_per_round: int = 1000,
-        *args: Any, **kwargs: Any
-) -> Tuple[float, List[Tuple[float | int, ...]]]:
-    accumulator = 0
-    results = []
-    new_accumulator = 0
-    stability = 0
-    iterations = 0
-    new_iterations = 0
-
-    while stability < required_stability:
-        for _ in range(iterations_per_round):
-            result = func(*args, **kwargs)
-            new_accumulator += discriminator(result)
-            results.append(result)
-            new_iterations += 1
-
-        if iterations:
-            confidence = calculate_confidence(accumulator / iterations, new_accumulator / new_iterations)
-        else:
-            confidence = 0
-
-        if confidence >= required_confidence:
-            stability += 1
-        else:
-            stability = 0
-
-        accumulator = new_accumulator
-        iterations = new_iterations
-
-    return accumulator / iterations, results
-
-
-from multiprocessing import Pool
+        *args: Any, streaming: bool = False, store: Optional[Store] = None,
+        precision: Optional[Stopping] = None, seed: Optional[int] = None,
+        control: Optional[ControlVariate] = None, antithetic: bool = False,
+        progress: Optional[ProgressHook] = None, proposal: Optional[Any] = None, strata: Optional[Strata] = None,
+        trial_timeout: Optional[float] = None, tune: Optional[AutoTune] = None,
+        exemplars: Optional[Exemplars] = None, **kwargs: Any
+) -> Tuple[Mean, Results]:
+    return _serial("self_stabalising", func, args, kwargs, discriminator, required_confidence, required_stability,
+                   iterations_per_round, streaming, store, precision, seed, control, antithetic, progress, proposal,
+                   strata, trial_timeout, tune, exemplars)
+
+
+def run_chunk(
+        func: Callable[..., Tuple[int | float, ...]],
+        discriminator: Callable[[Tuple[int | float]], int | float],
+        chunk_size: int,
+        args: Tuple[Any, ...],
+        sink_factory: Optional[Callable[[], ResultStats | ColumnStore | Distributions]] = None,
+        seed: Optional[int] = None,
+        control: Optional[ControlVariate] = None,
+        antithetic: bool = False,
+        proposal: Optional[Any] = None,
+        strata: Optional[Strata] = None,
+        budget: Optional[TrialBudget] = None,
+        exemplars: Optional[Exemplars] = None
+) -> Tuple[Estimate, Optional[ResultStats | ColumnStore | Distributions], ChunkTiming, Optional[Exemplars]]:
+    # Given exemplars, the chunk fills an empty copy of them and sends that back to be merged.
+    started = time.perf_counter()
+    seed_global(seed)
+    estimate = new_estimate(discriminator, control, antithetic, proposal, strata)
+    sink = sink_factory() if sink_factory else None
+    kept = exemplars.empty() if exemplars is not None else None
+    timed_out = run_block(func, args, {}, discriminator, chunk_size, estimate, sink.push if sink is not None else None,
+                          control, antithetic, proposal, strata, budget, kept)
+    return estimate, sink, ChunkTiming(os.getpid(), time.perf_counter() - started, timed_out), kept
+
+
+def _profiled_chunk(
+        options: Optional[Tuple[str, float]],
+        *chunk_args: Any
+) -> Tuple[Estimate, Optional[ResultStats | ColumnStore | Distributions], ChunkTiming, Optional[Exemplars],
+           Optional[WorkerProfile]]:
+    if options is None:
+        return *run_chunk(*chunk_args), None
+    (estimate, sink, timing, kept), worker_profile = profile_call(*options, run_chunk, *chunk_args)
+    return estimate, sink, timing, kept, worker_profile
+
+
+def _indexed_chunk(
+        call: Tuple[int, Tuple[Any, ...]]
+) -> Tuple[int, Tuple[Estimate, Optional[ResultStats | ColumnStore | Distributions], ChunkTiming, Optional[Exemplars]]]:
+    index, chunk_args = call
+    return index, run_chunk(*chunk_args)
+
+
+def _call_star(
+        call: Tuple[Callable[..., Tuple[int | float, ...]], Tuple[Any, ...], Optional[int]]
+) -> Tuple[int | float, ...]:
+    func, args, seed = call
+    seed_global(seed)
+    return func(*args)
+
+
+def _stream_seeds(seed: Optional[int], round_number: int, count: int) -> Iterable[Optional[int]]:
+    if seed is None:
+        return (None for _ in range(count))
+    return (derive_seed(seed, round_number, index) for index in range(count))
+
+
+def pool_size(pool: Any) -> int:
+    # multiprocessing.Pool only records its size privately; a Coordinator reports its connected workers.
+    return getattr(pool, "processes", None) or getattr(pool, "_processes", None) or 1
+
+
+def split_round(iterations_per_round: int, chunk_size: int) -> List[int]:
+    full_chunks, remainder = divmod(iterations_per_round, chunk_size)
+    return [chunk_size] * full_chunks + ([remainder] if remainder else [])
 
 
 def monte_carlo_self_stabalising_parallel(
@@ -128,38 +480,254 @@ def monte_carlo_self_stabalising_parallel(
         required_confidence: int = 3,
         required_stability: int = 10,
         iterations_per_round: int = 1000,
-        *args: Any
-) -> Tuple[float, List[Tuple[float | int, ...]]]:
-    accumulator = 0
-    results = []
-    new_accumulator = 0
+        *args: Any,
+        chunk_size: Optional[int] = None,
+        streaming: bool = False,
+        store: Optional[Store] = None,
+        precision: Optional[Stopping] = None,
+        seed: Optional[int] = None,
+        control: Optional[ControlVariate] = None,
+        antithetic: bool = False,
+        checkpoint: Optional[str] = None,
+        checkpoint_interval: float = 60.0,
+        progress: Optional[ProgressHook] = None,
+        pool: Optional[Any | str] = None,
+        profile: Optional[Profile] = None,
+        cache: Optional[ResultCache] = None,
+        proposal: Optional[Any] = None,
+        strata: Optional[Strata] = None,
+        trial_timeout: Optional[float] = None,
+        tune: Optional[AutoTune] = None,
+        exemplars: Optional[Exemplars] = None
+) -> Tuple[Mean, Results]:
+    # With a chunk_size each worker runs a block of trials and applies the discriminator itself, sending back
+    # its estimator and, when streaming or given a store, its own results to merge. With a seed each chunk (or
+    # trial) reseeds from its (seed, round, index) path, so the estimate does not depend on scheduling.
+    # pool may be any executor or a Coordinator, kept running, or an executor name, made and shut down here.
+    # Near the end of a round idle workers start the next round's first chunks, dropped if its sizes change.
+    # A trial that overruns trial_timeout is left out and counted as timed_out on the progress events.
+    # Exemplars only cover the trials run by this call, not a resumed checkpoint's.
+    check_estimator(discriminator, precision, control, antithetic, proposal, strata)
+    check_exemplars(exemplars, func, antithetic, proposal)
+    chunked = bool(chunk_size) or tune is not None
+    if (control or antithetic or proposal is not None or strata is not None) and not chunked:
+        raise ValueError("Variance reduction needs chunk_size so that each worker owns its estimator")
+    if profile and not chunked:
+        raise ValueError("Profiling needs chunk_size so that each worker profiles a block of trials")
+    if trial_timeout and not chunked:
+        raise ValueError("A trial_timeout needs chunk_size so that each worker times its own trials")
+    if exemplars is not None and not chunked:
+        raise ValueError("Exemplars need chunk_size so that each worker keeps its own reservoirs")
+    budget = TrialBudget(trial_timeout) if trial_timeout else None
+    results = new_results(streaming, store)
+    shared = isinstance(store, SharedColumns)
+    if shared:
+        if checkpoint or cache is not None:
+            raise ValueError("SharedColumns do not outlive the run, so cannot be checkpointed or cached")
+        if budget is not None:
+            raise ValueError("SharedColumns reserve a row for every trial, so cannot drop the ones that time out")
+        sink_factory = None
+    elif isinstance(store, Distributions):
+        sink_factory = store.empty
+    elif store is not None:
+        sink_factory = partial(ColumnStore, store.typecodes, store.names)
+    else:
+        sink_factory = ResultStats if streaming else None
+    estimate = new_estimate(discriminator, control, antithetic, proposal, strata)
     stability = 0
-    iterations = 0
-    new_iterations = 0
-    pool = Pool()
-
-    while stability < required_stability:
-        round_results = pool.starmap(func, (args for _ in range(iterations_per_round)))
-        new_accumulator += sum(pool.map(discriminator, round_results))
-        results.extend(round_results)
-        new_iterations += iterations_per_round
-
-        if iterations:
-            confidence = calculate_confidence(accumulator / iterations, new_accumulator / new_iterations)
+    round_number = 0
+
+    if cache is not None:
+        if checkpoint:
+            raise ValueError("A cached run keeps its own checkpoint; pass either cache or checkpoint")
+        if store is not None and not isinstance(store, Distributions):
+            raise ValueError("A ColumnStore lives in its own directory and cannot be cached")
+        if exemplars is not None:
+            raise ValueError("Exemplars are not cached, so a repeat of a cached run would have none to replay")
+        checkpoint = cache.path(func, discriminator, args, seed=seed,
+                                chunk_size=chunk_size if tune is None else "tuned", streaming=streaming,
+                                store=store.empty() if store is not None else None, control=control,
+                                antithetic=antithetic, proposal=proposal,
+                                strata=(strata.probabilities, strata.neyman, strata.floor) if strata else None,
+                                trial_timeout=trial_timeout)
+
+    config = estimator_config(estimate, discriminator, control, antithetic, proposal, strata)
+    resumed = load_checkpoint(checkpoint) if checkpoint else None
+    if resumed:
+        if resumed.seed != seed:
+            raise ValueError(f"Checkpoint {checkpoint} was written with seed {resumed.seed}, not {seed}")
+        written = getattr(resumed, "estimator", None)
+        if written != config:
+            raise ValueError(f"Checkpoint {checkpoint} was written for the estimator {written}, not {config}")
+        if type(resumed.results) is not type(results):
+            raise ValueError(f"Checkpoint {checkpoint} holds {type(resumed.results).__name__} results, "
+                             f"not {type(results).__name__}")
+        estimate, results, round_number = resumed.estimate, resumed.results, resumed.round_number
+        if store is not None:
+            # The caller's store takes over the checkpoint's, so that it holds the whole run.
+            directories = [getattr(holder, "directory", None) for holder in (store, results)]
+            if len({os.path.abspath(directory) if directory else None for directory in directories}) > 1:
+                raise ValueError(f"Checkpoint {checkpoint} spilled its results to {results.directory}, "
+                                 f"not {store.directory}")
+            vars(store).update(vars(results))
+            results = store
+        if resumed.required_confidence == required_confidence:
+            stability = resumed.stability
+    last_saved = time.monotonic()
+
+    # A resumed run that already meets converge's stopping rule runs no trials, so starts no workers for them.
+    settled = resumed is not None and (stability >= required_stability
+                                       or bool(precision and precision.satisfied(estimate)))
+    owns_pool = pool is None or isinstance(pool, str)
+    pool = make_executor("serial" if settled else pool or "process") if owns_pool else pool
+    # A proposal's tilt, the stratum split, the alarm behind a trial budget and the generator exemplars reseed
+    # all live in module globals, which chunks running side by side in threads would overwrite for each other.
+    if getattr(pool, "shares_globals", False) and (proposal is not None or strata is not None or budget is not None
+                                                   or exemplars is not None):
+        if owns_pool:
+            pool.close()
+            pool.join()
+        raise ValueError("Proposals, strata, trial budgets and exemplars need an executor whose workers do not "
+                         "share this interpreter's globals, such as process")
+    workers = pool_size(pool)
+    tracker = Progress("parallel", progress, workers)
+    # Reserved slots and Neyman allocations are fixed when a chunk is dispatched, so neither can start early.
+    eager = hasattr(pool, "imap_unordered") and not shared and strata is None
+    # Chunks started early, by index in the next round, with the size they were started at.
+    ahead: Dict[int, Tuple[int, Iterator[Tuple[int, Tuple[Estimate, Any, ChunkTiming, Optional[Exemplars]]]]]] = {}
+
+    def round_chunk_size() -> int:
+        return tune.chunk if tune is not None else chunk_size
+
+    # Chunks are sent an empty copy, not the reservoirs filled so far.
+    chunk_exemplars = exemplars.empty() if exemplars is not None else None
+
+    def chunk_call(size: int, sink: Optional[Callable[[], Any]], chunk_seed: Optional[int]) -> Tuple[Any, ...]:
+        return (func, discriminator, size, args, sink, chunk_seed, control, antithetic, proposal, strata, budget,
+                chunk_exemplars)
+
+    def run_eagerly(chunk_args: List[Tuple[Any, ...]], round_number: int
+                    ) -> List[Tuple[Estimate, Any, ChunkTiming, Optional[Exemplars]]]:
+        nonlocal ahead
+        started = {index: pending for index, (size, pending) in ahead.items()
+                   if index < len(chunk_args) and chunk_args[index][2] == size}
+        ahead = {}
+        fresh = [index for index in range(len(chunk_args)) if index not in started]
+        streams = [pool.imap_unordered(_indexed_chunk, ((index, chunk_args[index]) for index in fresh)),
+                   *started.values()]
+        size = round_chunk_size()
+        # A tuned next round is not planned yet, so it is taken to be as large as this one.
+        next_round = sum(call[2] for call in chunk_args) if tune is not None else iterations_per_round
+        most_ahead = max(1, next_round // size)
+        done: Dict[int, Tuple[Estimate, Any, ChunkTiming, Optional[Exemplars]]] = {}
+        for stream in streams:
+            for index, chunk in stream:
+                done[index] = chunk
+                idle = workers - (len(chunk_args) - len(done)) - len(ahead)
+                while idle > 0 and len(ahead) < most_ahead:
+                    next_index = len(ahead)
+                    next_seed = derive_seed(seed, round_number + 1, next_index) if seed is not None else None
+                    call = (next_index, chunk_call(size, sink_factory, next_seed))
+                    ahead[next_index] = size, pool.imap_unordered(_indexed_chunk, (call,))
+                    idle -= 1
+        return [done[index] for index in range(len(chunk_args))]
+
+    def run_round(round_size: int, round_number: int) -> List[ChunkTiming]:
+        timings = []
+        if chunked:
+            if strata is not None:
+                strata.update(estimate)
+            started = time.perf_counter()
+            chunks = split_round(round_size, round_chunk_size())
+            dropped = 0
+            if tune is not None:
+                # Tuned sizes are not reproducible anyway, so chunks started at an earlier size are kept as
+                # they are, even if that runs the round over, and the rest of the round is split around them.
+                early = []
+                while len(early) in ahead and sum(early) < round_size:
+                    early.append(ahead[len(early)][0])
+                if early:
+                    chunks = early + split_round(max(0, round_size - sum(early)), round_chunk_size())
+                dropped = len(ahead) - len(early)
+            seeds = _stream_seeds(seed, round_number, len(chunks))
+            if shared:
+                sinks = [results.reserve(size * 2 if antithetic else size) for size in chunks]
+            else:
+                sinks = [sink_factory] * len(chunks)
+            chunk_args = [chunk_call(size, sink, chunk_seed) for size, sink, chunk_seed in zip(chunks, sinks, seeds)]
+            if profile and profile.profiled_trials < profile.trials:
+                profiled = ((profile.claim(chunk[2]), *chunk) for chunk in chunk_args)
+                chunk_results = pool.starmap(_profiled_chunk, profiled)
+            elif eager:
+                chunk_results = ((*chunk, None) for chunk in run_eagerly(chunk_args, round_number))
+            else:
+                chunk_results = ((*chunk, None) for chunk in pool.starmap(run_chunk, chunk_args))
+            for chunk_estimate, stats, timing, kept, worker_profile in chunk_results:
+                estimate.merge(chunk_estimate)
+                timings.append(timing)
+                if stats is not None:
+                    results.merge(stats)
+                if kept is not None:
+                    exemplars.merge(kept)
+                if worker_profile is not None:
+                    profile.merge(worker_profile, timing.seconds)
+            if tune is not None:
+                # A dropped chunk keeps its worker busy into this round, so the round says nothing about overhead
+                # and only its size is passed on.
+                compute = 0.0 if dropped else sum(timing.seconds for timing in timings)
+                tune.observe(sum(chunks), compute, time.perf_counter() - started, workers, len(chunks))
+            timed_out = sum(timing.timed_out for timing in timings)
+            tracker.timed_out += timed_out
+            if timed_out == sum(chunks):
+                raise RuntimeError(f"Every trial in round {round_number} timed out")
+        elif not isinstance(results, list):
+            calls = ((func, args, trial_seed) for trial_seed in _stream_seeds(seed, round_number, round_size))
+            for result in pool.imap(_call_star, calls):
+                estimate.push(discriminator(result))
+                results.push(result)
+        elif seed is not None:
+            calls = ((func, args, trial_seed) for trial_seed in _stream_seeds(seed, round_number, round_size))
+            round_results = pool.map(_call_star, calls)
+            estimate.extend(pool.map(discriminator, round_results))
+            results.extend(round_results)
         else:
-            confidence = 0
+            round_results = pool.starmap(func, (args for _ in range(round_size)))
+            estimate.extend(pool.map(discriminator, round_results))
+            results.extend(round_results)
+        return timings
+
+    def after_round(stability: int, round_number: int):
+        nonlocal last_saved
+        if checkpoint and time.monotonic() - last_saved >= checkpoint_interval:
+            save_checkpoint(checkpoint, Checkpoint(estimate, results, stability, required_confidence, round_number,
+                                                   seed, config))
+            last_saved = time.monotonic()
+
+    try:
+        stability, round_number = converge(run_round, estimate, tracker, required_confidence, required_stability,
+                                           iterations_per_round, precision, stability, round_number, after_round,
+                                           tune, workers)
+    finally:
+        if owns_pool:
+            # Chunks started for a round that never came are not worth waiting for.
+            if ahead and hasattr(pool, "terminate"):
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
 
-        if confidence >= required_confidence:
-            stability += 1
-            print(f"Iteration {iterations}: stability {stability} at confidence {confidence}")
-        else:
-            stability = 0
-            print(f"Iteration {iterations}: no stability at confidence {confidence}")
+    if exemplars is not None:
+        exemplars.replay(func, args)
+    if checkpoint:
+        save_checkpoint(checkpoint, Checkpoint(estimate, results, stability, required_confidence, round_number,
+                                               seed, config))
+    if cache is not None:
+        cache.evict(keep=checkpoint)
 
-        accumulator = new_accumulator
-        iterations = new_iterations
+    tracker.finish(estimate, precision.interval(estimate) if precision else None, stability,
+                   **estimate_details(estimate, tracker.timed_out))
 
-    return accumulator / iterations, results
+    return estimate.mean, results
 
 
 def roll_die():
@@ -175,8 +743,9 @@ if __name__ == "__main__":
     average_die_roll, _ = monte_carlo_self_stabalising_parallel(
         roll_die,
         die_discriminator,
-        iterations_per_round=10_000,
-        required_stability=5
+        required_stability=5,
+        tune=AutoTune(),
+        progress=print_progress
     )
     print(f"Average die roll is {average_die_roll}")
 
@@ -192,14 +761,15 @@ if __name__ == '__main__':
     # simulate(duel_instrumented, [], {}, discriminator)
 
     def blackjack_instrumented() -> Tuple[float, ...]:
-        winnings = play_blackjack(Random(), CautiousPlayer(Random()))
+        rng = Random(getrandbits(64))
+        winnings = play_blackjack(rng, CautiousPlayer(rng))
         return winnings, winnings > 0
 
     def blackjack_discriminator(result):
         winnings, won = result
         return winnings
 
-    won, stats = simulate(blackjack_instrumented, [], {}, blackjack_discriminator)
+    won, stats = simulate(blackjack_instrumented, [], {}, blackjack_discriminator, progress=print_progress)
     print(f"Average winnings {won}")
 
 
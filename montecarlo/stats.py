@@ -0,0 +1,99 @@
+import math
+from typing import Iterable, List, Tuple
+
+
+class RunningStats:
+    count: int
+    mean: float
+    m2: float
+    minimum: float
+    maximum: float
+
+    def __init__(self):
+        self.count = 0
+        self.mean = self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def push(self, value: int | float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def extend(self, values: Iterable[int | float]):
+        for value in values:
+            self.push(value)
+
+    def merge(self, other: "RunningStats"):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def total(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def variance(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def __repr__(self):
+        return (f"RunningStats(count={self.count}, mean={self.mean}, variance={self.variance}, "
+                f"min={self.minimum}, max={self.maximum})")
+
+
+class ResultStats:
+    fields: List[RunningStats]
+
+    def __init__(self, width: int = 0):
+        self.fields = [RunningStats() for _ in range(width)]
+
+    def push(self, result: Tuple[int | float, ...]):
+        if not self.fields:
+            self.fields = [RunningStats() for _ in result]
+        for field, value in zip(self.fields, result):
+            field.push(value)
+
+    def merge(self, other: "ResultStats"):
+        if not self.fields:
+            self.fields = [RunningStats() for _ in other.fields]
+        for field, other_field in zip(self.fields, other.fields):
+            field.merge(other_field)
+
+    @property
+    def count(self) -> int:
+        return self.fields[0].count if self.fields else 0
+
+    def __getitem__(self, index: int) -> RunningStats:
+        return self.fields[index]
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __repr__(self):
+        return f"ResultStats({self.fields!r})"
@@ -0,0 +1,57 @@
+import math
+from statistics import NormalDist
+
+from montecarlo.stats import RunningStats
+
+
+class Precision:
+    half_width: float
+    relative: bool
+    confidence_level: float
+    min_trials: int
+
+    def __init__(self, half_width: float, relative: bool = False, confidence_level: float = 0.95,
+                 min_trials: int = 100):
+        if half_width <= 0:
+            raise ValueError("half_width must be positive")
+        if not 0 < confidence_level < 1:
+            raise ValueError("confidence_level must be between 0 and 1")
+        self.half_width = half_width
+        self.relative = relative
+        self.confidence_level = confidence_level
+        self.min_trials = max(2, min_trials)
+
+    @property
+    def z(self) -> float:
+        return NormalDist().inv_cdf(0.5 + self.confidence_level / 2)
+
+    def interval(self, estimate: RunningStats) -> float:
+        if estimate.count < 2:
+            return math.inf
+        return self.z * estimate.std / math.sqrt(estimate.count)
+
+    def target(self, estimate: RunningStats) -> float:
+        if self.relative:
+            return self.half_width * abs(estimate.mean)
+        return self.half_width
+
+    def satisfied(self, estimate: RunningStats) -> bool:
+        if estimate.count < self.min_trials:
+            return False
+        target = self.target(estimate)
+        # A relative target around a mean of zero (a rare event not yet seen) can never be met.
+        if target == 0:
+            return False
+        return self.interval(estimate) <= target
+
+    def trials_needed(self, estimate: RunningStats) -> int | float:
+        if estimate.count < self.min_trials:
+            return self.min_trials
+        target = self.target(estimate)
+        if target == 0:
+            return math.inf
+        return math.ceil((self.z * estimate.std / target) ** 2)
+
+    def round_size(self, estimate: RunningStats, max_round: int) -> int:
+        remaining = self.trials_needed(estimate) - estimate.count
+        return int(min(max(remaining, 1), max_round))
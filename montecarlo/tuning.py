@@ -0,0 +1,86 @@
+import math
+from typing import Optional
+
+
+class AutoTune:
+    # Sizes rounds and chunks from what the previous rounds cost, in place of a fixed iterations_per_round and
+    # chunk_size. A round aims to take round_seconds of wall time across all the workers. A chunk is made
+    # large enough that its share of time computing, rather than being dispatched and sent back, is at least
+    # compute_share, and otherwise small enough to give each worker chunks_per_worker of them for balance.
+    # When those pull apart the compute share wins and the round runs long. The first round runs
+    # initial_trials to take the measurements, and no round grows past max_growth times the last.
+    # Sizes depend on timings, so a seeded run only repeats exactly with fixed sizes.
+    round_seconds: float
+    compute_share: float
+    initial_trials: int
+    chunks_per_worker: int
+    max_growth: float
+    smoothing: float
+    trial_seconds: Optional[float]
+    chunk_overhead: float
+    chunk: Optional[int]
+    last_round: int
+
+    def __init__(self, round_seconds: float = 1.0, compute_share: float = 0.9, initial_trials: int = 100,
+                 chunks_per_worker: int = 4, max_growth: float = 10.0, smoothing: float = 0.5):
+        if round_seconds <= 0:
+            raise ValueError("round_seconds must be positive")
+        if not 0 < compute_share < 1:
+            raise ValueError("compute_share must be between 0 and 1")
+        if initial_trials < 1 or chunks_per_worker < 1 or max_growth <= 1:
+            raise ValueError("initial_trials and chunks_per_worker must be at least 1, max_growth above 1")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be above 0 and at most 1")
+        self.round_seconds = round_seconds
+        self.compute_share = compute_share
+        self.initial_trials = initial_trials
+        self.chunks_per_worker = chunks_per_worker
+        self.max_growth = max_growth
+        self.smoothing = smoothing
+        self.trial_seconds = None
+        self.chunk_overhead = 0.0
+        self.chunk = None
+        self.last_round = initial_trials
+
+    def _smooth(self, previous: Optional[float], measured: float) -> float:
+        if previous is None:
+            return measured
+        return self.smoothing * measured + (1 - self.smoothing) * previous
+
+    def observe(self, trials: int, compute_seconds: float, wall_seconds: float, workers: int = 1, chunks: int = 1):
+        # compute_seconds is the time spent inside trials summed over workers; whatever else the workers had
+        # of wall_seconds went on dispatch, transfer and waiting, and is charged to the chunks. A round that
+        # ran other than planned, cut short by a stopping rule or run over by early chunks, is what the next
+        # one may grow from. Without compute_seconds only the round's size is taken.
+        if trials <= 0:
+            return
+        self.last_round = trials
+        if compute_seconds <= 0:
+            return
+        self.trial_seconds = self._smooth(self.trial_seconds, compute_seconds / trials)
+        # Workers left without a chunk were idle for want of work, not for overhead.
+        busy = min(workers, max(1, chunks))
+        overhead = max(0.0, wall_seconds * busy - compute_seconds) / max(1, chunks)
+        self.chunk_overhead = self._smooth(self.chunk_overhead, overhead)
+
+    def _round_target(self, workers: int) -> float:
+        target = workers * self.round_seconds / self.trial_seconds
+        return min(target, self.last_round * self.max_growth)
+
+    def round_trials(self, workers: int = 1) -> int:
+        # Plans the next round from the measurements so far: returns its size and leaves its chunk size on
+        # self.chunk.
+        if self.trial_seconds is None:
+            self.chunk = max(1, math.ceil(self.initial_trials / workers))
+            return self.initial_trials
+        target = self._round_target(workers)
+        # A chunk of s trials computes for s * c and costs o on top: s * c / (s * c + o) >= share.
+        efficient = self.compute_share / (1 - self.compute_share) * self.chunk_overhead / self.trial_seconds
+        balanced = target / (workers * self.chunks_per_worker)
+        self.chunk = max(1, math.ceil(max(efficient, balanced)))
+        return self.chunk * max(workers, math.ceil(target / self.chunk))
+
+    def __repr__(self):
+        cost = f"{self.trial_seconds * 1e6:.1f}us per trial" if self.trial_seconds is not None else "unmeasured"
+        return (f"AutoTune(round_seconds={self.round_seconds}, compute_share={self.compute_share}, {cost}, "
+                f"{self.chunk_overhead * 1e3:.2f}ms per chunk)")
@@ -0,0 +1,279 @@
+import math
+from random import Random, choices
+from typing import Callable, List, Sequence, Tuple
+
+from montecarlo.stats import RunningStats
+
+
+class AntitheticRandom(Random):
+    # Mirrors every draw of a Random seeded the same way: u becomes 1 - u and k in range(n) becomes n - 1 - k.
+    def random(self) -> float:
+        return 1.0 - super().random()
+
+    def _randbelow(self, n: int) -> int:
+        return n - 1 - super()._randbelow(n)
+
+
+class ControlVariate:
+    func: Callable[[Tuple[int | float, ...]], int | float]
+    mean: float
+
+    def __init__(self, func: Callable[[Tuple[int | float, ...]], int | float], mean: float):
+        self.func = func
+        self.mean = mean
+
+
+class ControlVariateStats:
+    control_mean: float
+    count: int
+    mean_y: float
+    mean_c: float
+    m2_y: float
+    m2_c: float
+    co_moment: float
+
+    def __init__(self, control_mean: float):
+        self.control_mean = control_mean
+        self.count = 0
+        self.mean_y = self.mean_c = 0.0
+        self.m2_y = self.m2_c = self.co_moment = 0.0
+
+    def push(self, value: int | float, control: int | float):
+        self.count += 1
+        delta_y = value - self.mean_y
+        delta_c = control - self.mean_c
+        self.mean_y += delta_y / self.count
+        self.mean_c += delta_c / self.count
+        self.m2_y += delta_y * (value - self.mean_y)
+        self.m2_c += delta_c * (control - self.mean_c)
+        self.co_moment += delta_y * (control - self.mean_c)
+
+    def merge(self, other: "ControlVariateStats"):
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta_y = other.mean_y - self.mean_y
+        delta_c = other.mean_c - self.mean_c
+        weight = self.count * other.count / count
+        self.m2_y += other.m2_y + delta_y * delta_y * weight
+        self.m2_c += other.m2_c + delta_c * delta_c * weight
+        self.co_moment += other.co_moment + delta_y * delta_c * weight
+        self.mean_y += delta_y * other.count / count
+        self.mean_c += delta_c * other.count / count
+        self.count = count
+
+    @property
+    def beta(self) -> float:
+        if self.m2_c == 0:
+            return 0.0
+        return self.co_moment / self.m2_c
+
+    @property
+    def mean(self) -> float:
+        return self.mean_y - self.beta * (self.mean_c - self.control_mean)
+
+    @property
+    def raw_variance(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return self.m2_y / (self.count - 1)
+
+    @property
+    def variance(self) -> float:
+        if self.count < 3:
+            return self.raw_variance
+        return max(0.0, self.m2_y - self.beta * self.co_moment) / (self.count - 2)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def variance_reduction(self) -> float:
+        if self.variance == 0:
+            return math.inf
+        return self.raw_variance / self.variance
+
+
+class AntitheticStats:
+    pairs: RunningStats
+    singles: RunningStats
+
+    def __init__(self):
+        self.pairs = RunningStats()
+        self.singles = RunningStats()
+
+    def push_pair(self, value: int | float, antithetic_value: int | float):
+        self.pairs.push((value + antithetic_value) / 2)
+        self.singles.push(value)
+        self.singles.push(antithetic_value)
+
+    def merge(self, other: "AntitheticStats"):
+        self.pairs.merge(other.pairs)
+        self.singles.merge(other.singles)
+
+    @property
+    def count(self) -> int:
+        return self.pairs.count
+
+    @property
+    def mean(self) -> float:
+        return self.pairs.mean
+
+    @property
+    def variance(self) -> float:
+        return self.pairs.variance
+
+    @property
+    def std(self) -> float:
+        return self.pairs.std
+
+    @property
+    def variance_reduction(self) -> float:
+        # Against two independent trials, whose mean would have half the single-trial variance.
+        if self.pairs.variance == 0:
+            return math.inf
+        return self.singles.variance / 2 / self.pairs.variance
+
+
+class ImportanceStats:
+    # Trials are drawn from a proposal and each value is scaled by its likelihood ratio, so the mean of the
+    # weighted values estimates the mean under the original distribution. weighted_squares (w * f^2) also
+    # estimates E[f^2] under the original, which gives the variance plain sampling would have had.
+    values: RunningStats
+    weights: RunningStats
+    weighted_squares: RunningStats
+
+    def __init__(self):
+        self.values = RunningStats()
+        self.weights = RunningStats()
+        self.weighted_squares = RunningStats()
+
+    def push(self, value: int | float, weight: float):
+        self.values.push(value * weight)
+        self.weights.push(weight)
+        self.weighted_squares.push(value * value * weight)
+
+    def merge(self, other: "ImportanceStats"):
+        self.values.merge(other.values)
+        self.weights.merge(other.weights)
+        self.weighted_squares.merge(other.weighted_squares)
+
+    @property
+    def count(self) -> int:
+        return self.values.count
+
+    @property
+    def mean(self) -> float:
+        return self.values.mean
+
+    @property
+    def variance(self) -> float:
+        return self.values.variance
+
+    @property
+    def std(self) -> float:
+        return self.values.std
+
+    @property
+    def effective_sample_size(self) -> float:
+        sum_squares = self.weights.m2 + self.weights.count * self.weights.mean ** 2
+        if sum_squares == 0:
+            return 0.0
+        return self.weights.total ** 2 / sum_squares
+
+    @property
+    def variance_reduction(self) -> float:
+        plain_variance = max(0.0, self.weighted_squares.mean - self.mean ** 2)
+        if self.variance == 0:
+            return math.inf
+        return plain_variance / self.variance
+
+
+class Strata:
+    # Splits the trials of a block between strata with known probabilities; trial functions take the stratum
+    # index as stratum=. Allocation starts proportional to the probabilities and, with neyman set, moves
+    # towards probability * standard deviation as each stratum's spread becomes known, keeping a
+    # `floor` share of proportional allocation so a stratum that has shown no variance yet is still sampled.
+    probabilities: List[float]
+    fractions: List[float]
+    neyman: bool
+    floor: float
+
+    def __init__(self, probabilities: Sequence[float], neyman: bool = True, floor: float = 0.1):
+        if any(probability < 0 for probability in probabilities) or not math.isclose(sum(probabilities), 1.0):
+            raise ValueError("Stratum probabilities must be non-negative and sum to 1")
+        self.probabilities = list(probabilities)
+        self.fractions = list(probabilities)
+        self.neyman = neyman
+        self.floor = floor
+
+    def update(self, estimate: "StratifiedStats"):
+        if not self.neyman or any(stratum.count < 2 for stratum, probability
+                                  in zip(estimate.strata, self.probabilities) if probability > 0):
+            return
+        spreads = [probability * stratum.std for probability, stratum in zip(self.probabilities, estimate.strata)]
+        total = sum(spreads)
+        if total == 0:
+            return
+        self.fractions = [(1 - self.floor) * spread / total + self.floor * probability
+                          for spread, probability in zip(spreads, self.probabilities)]
+
+    def split(self, trials: int) -> List[int]:
+        # Whole trials by fraction, with the remainder handed out at random in proportion to what was cut off,
+        # so small chunks still sample small strata at the right rate on average.
+        exact = [trials * fraction for fraction in self.fractions]
+        counts = [int(share) for share in exact]
+        leftovers = [share - count for share, count in zip(exact, counts)]
+        for _ in range(trials - sum(counts)):
+            stratum = choices(range(len(counts)), leftovers if any(leftovers) else self.fractions)[0]
+            counts[stratum] += 1
+            leftovers[stratum] = 0.0
+        return counts
+
+
+class StratifiedStats:
+    # Combines per-stratum means by stratum probability. The reported variance is per trial, scaled so that
+    # variance / count is the variance of the combined mean, which is what Precision works from.
+    probabilities: List[float]
+    strata: List[RunningStats]
+
+    def __init__(self, probabilities: Sequence[float]):
+        self.probabilities = list(probabilities)
+        self.strata = [RunningStats() for _ in probabilities]
+
+    def push(self, stratum: int, value: int | float):
+        self.strata[stratum].push(value)
+
+    def merge(self, other: "StratifiedStats"):
+        for stratum, other_stratum in zip(self.strata, other.strata):
+            stratum.merge(other_stratum)
+
+    @property
+    def count(self) -> int:
+        return sum(stratum.count for stratum in self.strata)
+
+    @property
+    def mean(self) -> float:
+        return sum(probability * stratum.mean for probability, stratum in zip(self.probabilities, self.strata))
+
+    @property
+    def variance(self) -> float:
+        if any(stratum.count < 2 for stratum, probability in zip(self.strata, self.probabilities) if probability > 0):
+            return math.inf if self.count else 0.0
+        return self.count * sum(probability ** 2 * stratum.variance / stratum.count
+                                for probability, stratum in zip(self.probabilities, self.strata) if probability > 0)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def variance_reduction(self) -> float:
+        # Against plain sampling, whose per-trial variance is the within-strata plus between-strata spread.
+        within = sum(probability * stratum.variance for probability, stratum in zip(self.probabilities, self.strata))
+        between = sum(probability * (stratum.mean - self.mean) ** 2
+                      for probability, stratum in zip(self.probabilities, self.strata))
+        if self.variance == 0 or math.isinf(self.variance):
+            return math.inf if self.variance == 0 else 1.0
+        return (within + between) / self.variance
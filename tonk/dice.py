@@ -1,9 +1,66 @@
+from bisect import bisect
 from enum import StrEnum
-from random import randrange
-from typing import Iterable, List, TypeVar
+from itertools import accumulate
+from random import random, randrange
+from typing import Iterable, List, Optional, Sequence, TypeVar
+
+FAIR_D6 = (1 / 6,) * 6
+
+
+class TiltedD6:
+    # An importance sampling proposal for the dice. While entered, every d6() is drawn with these face
+    # probabilities instead of uniformly, and likelihood_ratio accumulates the fair over tilted probability of
+    # each face rolled since begin(). That product is the weight montecarlo gives the trial.
+    probabilities: Sequence[float]
+    likelihood_ratio: float
+
+    def __init__(self, weights: Sequence[float]):
+        if len(weights) != 6 or any(weight <= 0 for weight in weights):
+            raise ValueError("A tilted d6 needs six positive face weights")
+        total = sum(weights)
+        self.probabilities = tuple(weight / total for weight in weights)
+        self.cumulative = list(accumulate(self.probabilities))
+        self.ratios = tuple(fair / tilted for fair, tilted in zip(FAIR_D6, self.probabilities))
+        self.likelihood_ratio = 1.0
+        self.previous: Optional[TiltedD6] = None
+
+    @classmethod
+    def towards(cls, faces: Iterable[int], factor: float) -> "TiltedD6":
+        favoured = set(faces)
+        return cls([factor if face in favoured else 1.0 for face in range(1, 7)])
+
+    def roll(self) -> int:
+        face = min(bisect(self.cumulative, random()), 5) + 1
+        self.likelihood_ratio *= self.ratios[face - 1]
+        return face
+
+    def begin(self):
+        self.likelihood_ratio = 1.0
+
+    def weight(self) -> float:
+        return self.likelihood_ratio
+
+    def __enter__(self) -> "TiltedD6":
+        global _tilt
+        self.previous, _tilt = _tilt, self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _tilt
+        _tilt, self.previous = self.previous, None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["previous"] = None
+        return state
+
+
+_tilt: Optional[TiltedD6] = None
 
 
 def d6(modifier: int = 0) -> int:
+    if _tilt is not None:
+        return _tilt.roll() + modifier
     return randrange(1, 7) + modifier
 
 
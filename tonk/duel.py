@@ -1,7 +1,7 @@
 import math
 from copy import deepcopy
 from random import random
-from typing import List
+from typing import List, Optional
 
 from tonk.misc import Arc
 from tonk.tank import Tank
@@ -122,7 +122,10 @@ def basic_strategy(logs: List[str], current_tanks: List[Tank], current_name: str
             continue
 
 
-def duel(player_1_tanks: List[Tank], player_1_name: str, player_2_tanks: List[Tank], player_2_name: str):
+def duel(player_1_tanks: List[Tank], player_1_name: str, player_2_tanks: List[Tank], player_2_name: str,
+         max_turns: Optional[int] = None, logs: Optional[List[str]] = None):
+    # Fights until one side is wiped out, or until max_turns turns have been played. The log is appended to
+    # logs if given, and returned either way.
     player_1 = [deepcopy(tank) for tank in player_1_tanks]
     for n, tank in enumerate(player_1):
         tank.name += f" #{n}"
@@ -135,10 +138,13 @@ def duel(player_1_tanks: List[Tank], player_1_name: str, player_2_tanks: List[Ta
         tank.y = 18
         tank.rotation = math.pi
 
-    logs = []
+    if logs is None:
+        logs = []
 
     turn_number = 0
     while any(tank.alive for tank in player_1) and any(tank.alive for tank in player_2):
+        if max_turns is not None and turn_number >= max_turns:
+            break
         turn_number += 1
         logs.append(f"Turn {turn_number}")
         logs.append(f"===============================")
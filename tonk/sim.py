@@ -1,11 +1,28 @@
+from copy import deepcopy
+from typing import List, Optional, Sequence
+
+from montecarlo.budget import TrialTimeout
+from montecarlo.exemplars import Exemplars
+from montecarlo.metrics import Metrics, MetricPrecision
+from montecarlo.profiling import Profile
+from montecarlo.progress import print_progress
 from montecarlo.sim import monte_carlo_self_stabalising_parallel
+from montecarlo.stopping import Precision
+from montecarlo.variance import Strata
+from tonk.dice import TiltedD6
 from tonk.duel import duel
-from tonk.tanks import m4_sherman, panzer_iv, vc_firefly
+from tonk.misc import Arc
+from tonk.tank import Tank
+from tonk.tanks import m4_sherman, m4_sherman_main_gun, panzer_iv, vc_firefly
 
 
-def duel_instrumented():
-    logs, shermans, panzer, turns = duel([m4_sherman, m4_sherman, vc_firefly, vc_firefly, m4_sherman], "Shermans",
-             [panzer_iv, panzer_iv, panzer_iv, panzer_iv], "Panzers")
+def duel_outcome(shermans: Sequence[Tank], panzers: Sequence[Tank], max_turns: Optional[int] = None,
+                 logs: Optional[List[str]] = None):
+    # A duel still undecided after max_turns raises TrialTimeout, so the engine counts it apart from the rest.
+    # The duel's log goes into logs when it is given, which is how Exemplars replays a kept trial.
+    _, shermans, panzer, turns = duel(list(shermans), "Shermans", list(panzers), "Panzers", max_turns, logs)
+    if any(t.alive for t in shermans) and any(t.alive for t in panzer):
+        raise TrialTimeout(f"No winner after {turns} turns")
 
     if all(not t.alive for t in shermans):
         panzer_victory = 1
@@ -26,6 +43,28 @@ def duel_instrumented():
     return (turns, panzer_victory, sherman_victory, panzer_destroy, sherman_destroy, panzer_bail, sherman_bail, panzer_explode, sherman_explode)
 
 
+def duel_instrumented(max_turns: Optional[int] = None, logs: Optional[List[str]] = None):
+    return duel_outcome([m4_sherman, m4_sherman, vc_firefly, vc_firefly, m4_sherman],
+                        [panzer_iv, panzer_iv, panzer_iv, panzer_iv], max_turns, logs)
+
+
+TANKS = {"m4_sherman": m4_sherman, "vc_firefly": vc_firefly, "panzer_iv": panzer_iv}
+
+
+def matchup(shermans: Sequence[str], panzers: Sequence[str], max_turns: Optional[int] = None,
+            logs: Optional[List[str]] = None):
+    # duel_instrumented for any two lineups, named by their keys in TANKS so that a job file can list them.
+    # The first side still reports as the Shermans and the second as the Panzers.
+    unknown = [name for name in (*shermans, *panzers) if name not in TANKS]
+    if unknown:
+        raise ValueError(f"Unknown tanks {', '.join(unknown)}, expected some of {', '.join(TANKS)}")
+    return duel_outcome([TANKS[name] for name in shermans], [TANKS[name] for name in panzers], max_turns, logs)
+
+
+DUEL_FIELDS = ("turns", "panzer_victory", "sherman_victory", "panzer_destroy", "sherman_destroy", "panzer_bail",
+               "sherman_bail", "panzer_explode", "sherman_explode")
+
+
 def discriminator(result):
     turns, panzer_victory, sherman_victory, panzer_destroy, sherman_destroy, panzer_bail, sherman_bail, panzer_explode, sherman_explode = result
     return panzer_victory
@@ -33,10 +72,94 @@ def discriminator(result):
 
 def simulate():
 
-    win_rate, results = monte_carlo_self_stabalising_parallel(duel_instrumented, discriminator, required_stability=5)
+    win_rate, results = monte_carlo_self_stabalising_parallel(duel_instrumented, discriminator, required_stability=5,
+                                                              chunk_size=50, progress=print_progress)
 
     print(f"Panzers win {win_rate * 100:.2f}% of the time")
 
 
+def report():
+    metrics = Metrics.from_fields(DUEL_FIELDS)
+    precision = MetricPrecision({
+        "panzer_victory": Precision(0.01),
+        "turns": Precision(0.01, relative=True),
+        "sherman_explode": Precision(0.02),
+    })
+    means, results = monte_carlo_self_stabalising_parallel(duel_instrumented, metrics, chunk_size=50,
+                                                           precision=precision, progress=print_progress)
+
+    print(f"Panzers win {means['panzer_victory'] * 100:.2f}% of the time")
+    print(f"Shermans win {means['sherman_victory'] * 100:.2f}% of the time")
+    print(f"Duels last {means['turns']:.2f} turns")
+    print(f"{means['sherman_explode']:.2f} Panzers and {means['panzer_explode']:.2f} Shermans explode per duel")
+
+
+def any_exploded(result) -> bool:
+    return result[7] + result[8] > 0
+
+
+def panzer_wipe(result) -> bool:
+    return result[2] == 1
+
+
+def one_turn_explosion(result) -> bool:
+    # The whole duel was over in one turn and a tank exploded. The result does not say on which turn a tank
+    # exploded, so this is as close to an explosion on the first turn as the categories can see.
+    return result[0] == 1 and any_exploded(result)
+
+
+def examples(size: int = 3):
+    # Keeps a few duels of each rare kind and prints their logs.
+    kept = Exemplars(size, {"exploded": any_exploded, "panzer_wipe": panzer_wipe,
+                            "one_turn_explosion": one_turn_explosion})
+    monte_carlo_self_stabalising_parallel(duel_instrumented, discriminator, required_stability=5, chunk_size=50,
+                                          exemplars=kept)
+    for name, reservoir in kept.by_category.items():
+        print(f"{name}: {reservoir.seen} duels, keeping {len(reservoir)}")
+    for exemplar in kept["one_turn_explosion"]:
+        print(f"Seed {exemplar.seed}: {exemplar.result}")
+        print("\n".join(exemplar.logs))
+
+
+def profile(trials: int = 500, mode: str = "deterministic"):
+    profiler = Profile(trials, mode)
+    monte_carlo_self_stabalising_parallel(duel_instrumented, discriminator, required_stability=5, chunk_size=50,
+                                          profile=profiler)
+    print(profiler.report())
+
+
+SHOT_ARCS = (Arc.front, Arc.side, Arc.rear)
+
+
+def shot_instrumented(arc: Arc = Arc.front, stratum: Optional[int] = None):
+    if stratum is not None:
+        arc = SHOT_ARCS[stratum]
+    target = deepcopy(panzer_iv)
+    m4_sherman_main_gun.fire(m4_sherman, target, 12.0, arc)
+    return (1 if target.exploded else 0),
+
+
+def exploded(result):
+    explosion, = result
+    return explosion
+
+
+def rare_events():
+    # How often one 75mm shot at 12" cooks off a Panzer IV's ammunition: by plain sampling, with the dice
+    # tilted towards sixes, and stratified over an assumed mix of front, side and rear shots.
+    precision = Precision(0.05, relative=True)
+    rate, _ = monte_carlo_self_stabalising_parallel(shot_instrumented, exploded, iterations_per_round=50_000,
+                                                    chunk_size=5_000, precision=precision, progress=print_progress)
+    print(f"Front shots explode the Panzer {rate * 100:.3f}% of the time")
+    rate, _ = monte_carlo_self_stabalising_parallel(shot_instrumented, exploded, iterations_per_round=50_000,
+                                                    chunk_size=5_000, precision=precision, progress=print_progress,
+                                                    proposal=TiltedD6.towards([6], 4))
+    print(f"Front shots explode the Panzer {rate * 100:.3f}% of the time (tilted dice)")
+    rate, _ = monte_carlo_self_stabalising_parallel(shot_instrumented, exploded, iterations_per_round=50_000,
+                                                    chunk_size=5_000, precision=precision, progress=print_progress,
+                                                    strata=Strata([0.6, 0.3, 0.1]))
+    print(f"Shots from a 60/30/10 front/side/rear mix explode the Panzer {rate * 100:.3f}% of the time")
+
+
 if __name__ == "__main__":
     simulate()